@@ -0,0 +1,84 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.urls import URLPattern, URLResolver
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.ASYNC_DB_THREADS,
+            thread_name_prefix='async-db'
+        )
+    return _executor
+
+
+def database_sync_to_async(func):
+    """
+    Асинхронная обёртка над кодом, работающим с ORM. Django 3.2 не умеет
+    выполнять запросы к базе в цикле событий, поэтому func выполняется
+    в отдельном пуле из ASYNC_DB_THREADS потоков — у каждого своё
+    соединение — а не в единственном потоке для синхронного кода.
+    Устаревшие соединения закрываются так же, как в конце запроса.
+    """
+    @wraps(func)
+    def run(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(run, thread_sensitive=False, executor=get_executor())
+
+
+def async_view(view):
+    """
+    Асинхронный вариант представления view для ASGI: пока view выбирает
+    данные, сериализует и рендерит ответ в пуле потоков базы данных,
+    рабочий процесс принимает другие запросы.
+    """
+    def render(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+
+    render = database_sync_to_async(render)
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        return await render(request, *args, **kwargs)
+
+    return wrapper
+
+
+def with_async_views(patterns, routes, namespace=''):
+    """
+    Копия списка маршрутов, в которой представления маршрутов с именами
+    из routes (вида api:recipe-list) заменены асинхронными.
+    """
+    result = []
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            prefix = namespace
+            if pattern.namespace:
+                prefix = f'{namespace}{pattern.namespace}:'
+            pattern = URLResolver(
+                pattern.pattern,
+                with_async_views(pattern.url_patterns, routes, prefix),
+                pattern.default_kwargs, pattern.app_name, pattern.namespace
+            )
+        elif f'{namespace}{pattern.name}' in routes:
+            pattern = URLPattern(
+                pattern.pattern, async_view(pattern.callback),
+                pattern.default_args, pattern.name
+            )
+        result.append(pattern)
+    return result
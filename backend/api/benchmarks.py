@@ -0,0 +1,543 @@
+import asyncio
+import csv
+import os
+import random
+import statistics
+import time
+from base64 import b64decode
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.authtoken.models import Token
+
+from recipes.counters import recount_counters
+from recipes.ingredient_index import ingredient_index
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    ShoppingCart,
+    Tag,
+)
+from recipes.search import update_search_vectors
+from recipes.short_links import encode_short_code, short_link_index
+from users.models import Follow
+from .feed import backfill_feed
+
+User = get_user_model()
+
+PNG = b64decode(
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGA'
+    'WjR9awAAAABJRU5ErkJggg=='
+)
+INGREDIENTS_CSV = os.path.join(settings.BASE_DIR, 'data', 'ingredients.csv')
+TAGS = (
+    ('Завтрак', 'breakfast'),
+    ('Обед', 'lunch'),
+    ('Ужин', 'dinner'),
+    ('Десерт', 'dessert'),
+    ('Выпечка', 'baking'),
+)
+BATCH_SIZE = 1000
+HTTP_SCENARIOS = (
+    'recipe_list_anonymous',
+    'recipe_list_authenticated',
+    'recipe_list_compact',
+    'recipe_detail_anonymous',
+    'recipe_detail_authenticated',
+    'subscriptions',
+    'feed',
+    'ingredient_prefix_search',
+    'ingredient_fuzzy_search',
+    'shopping_cart_download',
+    'short_link_redirect',
+)
+SCENARIOS = HTTP_SCENARIOS + (
+    'ingredient_lookup', 'recipe_update', 'server_concurrency'
+)
+# Анонимные сценарии чтения, которые сравниваются под WSGI и ASGI.
+CONCURRENCY_SCENARIOS = (
+    'recipe_list_anonymous',
+    'recipe_detail_anonymous',
+    'ingredient_prefix_search',
+)
+
+
+def sample_pairs(rng, left_ids, right_ids, per_left, exclude_self=False):
+    """Случайные уникальные пары (left, right), до per_left на каждый left."""
+    pairs = []
+    for left_id in left_ids:
+        candidates = [
+            right_id for right_id in rng.sample(
+                right_ids, min(per_left + 1, len(right_ids))
+            )
+            if not (exclude_self and right_id == left_id)
+        ]
+        pairs.extend((left_id, right_id) for right_id in candidates[:per_left])
+    return pairs
+
+
+def seed_dataset(users_count, recipes_count, ingredients_per_recipe,
+                 follows_per_user, favorites_per_user, cart_per_user, seed):
+    """
+    Заполняет пустую базу синтетическими данными через bulk_create:
+    ингредиенты из data/ingredients.csv, теги, пользователи с токенами,
+    рецепты, подписки, избранное и корзины. Затем пересчитывает счётчики,
+    ленты и поисковые векторы так же, как это сделали бы сигналы.
+    """
+    rng = random.Random(seed)
+    with open(INGREDIENTS_CSV, encoding='utf-8') as file:
+        Ingredient.objects.bulk_create(
+            (
+                Ingredient(name=name.strip(), measurement_unit=unit.strip())
+                for name, unit in csv.reader(file)
+            ),
+            batch_size=BATCH_SIZE, ignore_conflicts=True
+        )
+    ingredient_index.invalidate()
+    Tag.objects.bulk_create(
+        Tag(name=name, slug=slug) for name, slug in TAGS
+    )
+    password = make_password('benchmark')
+    User.objects.bulk_create(
+        (
+            User(
+                username=f'bench{number}', email=f'bench{number}@example.org',
+                first_name='Bench', last_name=str(number), password=password
+            )
+            for number in range(users_count)
+        ),
+        batch_size=BATCH_SIZE
+    )
+    user_ids = list(User.objects.values_list('pk', flat=True))
+    Token.objects.bulk_create(
+        Token(user_id=user_id, key=Token.generate_key())
+        for user_id in user_ids
+    )
+    image = default_storage.save('recipes/benchmark.png', ContentFile(PNG))
+    Recipe.objects.bulk_create(
+        (
+            Recipe(
+                author_id=rng.choice(user_ids), name=f'Рецепт {number}',
+                text=f'Описание рецепта {number}. ' * 5,
+                cooking_time=rng.randint(5, 120), image=image
+            )
+            for number in range(recipes_count)
+        ),
+        batch_size=BATCH_SIZE
+    )
+    short_link_index.invalidate()
+    recipe_ids = list(Recipe.objects.values_list('pk', flat=True))
+    ingredient_ids = list(Ingredient.objects.values_list('pk', flat=True))
+    tag_ids = list(Tag.objects.values_list('pk', flat=True))
+    IngredientInRecipe.objects.bulk_create(
+        (
+            IngredientInRecipe(
+                recipe_id=recipe_id, ingredient_id=ingredient_id,
+                amount=rng.randint(1, 500)
+            )
+            for recipe_id, ingredient_id in sample_pairs(
+                rng, recipe_ids, ingredient_ids, ingredients_per_recipe
+            )
+        ),
+        batch_size=BATCH_SIZE
+    )
+    Recipe.tags.through.objects.bulk_create(
+        (
+            Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id, tag_id in sample_pairs(
+                rng, recipe_ids, tag_ids, 2
+            )
+        ),
+        batch_size=BATCH_SIZE
+    )
+    follows = sample_pairs(
+        rng, user_ids, user_ids, follows_per_user, exclude_self=True
+    )
+    Follow.objects.bulk_create(
+        (Follow(user_id=user_id, author_id=author_id)
+         for user_id, author_id in follows),
+        batch_size=BATCH_SIZE
+    )
+    for model, per_user in (
+        (Favorite, favorites_per_user), (ShoppingCart, cart_per_user)
+    ):
+        model.objects.bulk_create(
+            (
+                model(user_id=user_id, recipe_id=recipe_id)
+                for user_id, recipe_id in sample_pairs(
+                    rng, user_ids, recipe_ids, per_user
+                )
+            ),
+            batch_size=BATCH_SIZE
+        )
+    recount_counters()
+    for user_id, author_id in follows:
+        backfill_feed(user_id, author_id)
+    update_search_vectors(Recipe.objects.all())
+
+
+def get_query_count(response):
+    """Число SQL-запросов из заголовка Server-Timing."""
+    timing = response.get('Server-Timing', '')
+    if 'desc="' not in timing:
+        return 0
+    return int(timing.split('desc="')[1].split()[0])
+
+
+class DatabaseLatency:
+    """
+    Имитирует сетевую задержку до базы: пауза перед каждым SQL-запросом
+    во всех потоках, пока контекст открыт.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.active = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.active:
+            time.sleep(self.seconds)
+        return execute(sql, params, many, context)
+
+    def install(self, connection, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+    def __enter__(self):
+        self.active = True
+        connection_created.connect(self.install)
+        for thread_connection in connections.all():
+            self.install(thread_connection)
+        return self
+
+    def __exit__(self, *args):
+        self.active = False
+        connection_created.disconnect(self.install)
+
+
+def percentile(values, fraction):
+    """Процентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies, query_counts, statuses, elapsed):
+    return {
+        'requests': len(latencies),
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        'latency_ms': {
+            'p50': round(percentile(latencies, 0.5) * 1000, 2),
+            'p99': round(percentile(latencies, 0.99) * 1000, 2),
+            'mean': round(statistics.mean(latencies) * 1000, 2),
+            'max': round(max(latencies) * 1000, 2),
+        },
+        'queries': {
+            'mean': round(statistics.mean(query_counts), 2),
+            'max': max(query_counts),
+        },
+        'statuses': {
+            str(status): statuses.count(status) for status in set(statuses)
+        },
+    }
+
+
+class Benchmark:
+    """
+    Прогоняет сценарии через тестовый клиент Django: каждый запрос
+    проходит весь стек (middleware, аутентификация по токену, кэш,
+    рендеринг), время и число SQL-запросов измеряются на каждый запрос.
+    """
+
+    def __init__(self, requests_count, warmup, seed):
+        self.requests_count = requests_count
+        self.warmup = warmup
+        self.rng = random.Random(seed)
+        self.recipe_ids = list(Recipe.objects.values_list('pk', flat=True))
+        self.tokens = dict(Token.objects.values_list('user_id', 'key'))
+        self.ingredient_names = list(
+            Ingredient.objects.values_list('name', flat=True)
+        )
+        self.anonymous = Client()
+
+    def client_for(self, user_id):
+        return Client(HTTP_AUTHORIZATION=f'Token {self.tokens[user_id]}')
+
+    def random_user_client(self):
+        return self.client_for(self.rng.choice(list(self.tokens)))
+
+    def random_prefix(self):
+        name = self.rng.choice(self.ingredient_names)
+        return name[:self.rng.randint(1, 3)]
+
+    def scenarios(self):
+        """Сценарий: имя -> функция, возвращающая (клиент, метод, url)."""
+        pages = max(1, len(self.recipe_ids) // 6)
+        return {
+            'recipe_list_anonymous': lambda: (
+                self.anonymous, 'get',
+                f'/api/recipes/?page={self.rng.randint(1, min(pages, 20))}'
+            ),
+            'recipe_list_authenticated': lambda: (
+                self.random_user_client(), 'get',
+                f'/api/recipes/?page={self.rng.randint(1, min(pages, 20))}'
+            ),
+            'recipe_list_compact': lambda: (
+                self.random_user_client(), 'get',
+                f'/api/recipes/?page={self.rng.randint(1, min(pages, 20))}'
+                '&compact=1'
+            ),
+            'recipe_detail_anonymous': lambda: (
+                self.anonymous, 'get',
+                f'/api/recipes/{self.rng.choice(self.recipe_ids)}/'
+            ),
+            'recipe_detail_authenticated': lambda: (
+                self.random_user_client(), 'get',
+                f'/api/recipes/{self.rng.choice(self.recipe_ids)}/'
+            ),
+            'subscriptions': lambda: (
+                self.random_user_client(), 'get',
+                '/api/users/subscriptions/?recipes_limit=3'
+            ),
+            'feed': lambda: (
+                self.random_user_client(), 'get', '/api/recipes/feed/'
+            ),
+            'ingredient_prefix_search': lambda: (
+                self.anonymous, 'get',
+                f'/api/ingredients/?name={self.random_prefix()}'
+            ),
+            'ingredient_fuzzy_search': lambda: (
+                self.anonymous, 'get',
+                f'/api/ingredients/?search={self.random_prefix()}'
+            ),
+            'shopping_cart_download': lambda: (
+                self.random_user_client(), 'get',
+                '/api/recipes/download_shopping_cart/'
+            ),
+            'short_link_redirect': lambda: (
+                self.anonymous, 'get',
+                f'/s/{encode_short_code(self.rng.choice(self.recipe_ids))}/'
+            ),
+        }
+
+    def request(self, client, method, url, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = getattr(client, method)(url, **kwargs)
+            if response.streaming:
+                for _ in response.streaming_content:
+                    pass
+            latency = time.perf_counter() - start
+        return response.status_code, latency, queries.captured_queries
+
+    def run_scenario(self, make_request):
+        for _ in range(self.warmup):
+            self.request(*make_request())
+        latencies, query_counts, statuses = [], [], []
+        started = time.perf_counter()
+        for _ in range(self.requests_count):
+            status, latency, queries = self.request(*make_request())
+            latencies.append(latency)
+            query_counts.append(len(queries))
+            statuses.append(status)
+        return summarize(
+            latencies, query_counts, statuses, time.perf_counter() - started
+        )
+
+    def run_ingredient_lookup(self):
+        """
+        Поиск ингредиентов по префиксу без HTTP: индекс в памяти
+        против запроса istartswith к базе.
+        """
+        prefixes = [self.random_prefix() for _ in range(self.requests_count)]
+        ingredient_index.search('')
+        results = {}
+        for name, lookup in (
+            ('index', ingredient_index.search),
+            ('sql', lambda prefix: list(
+                Ingredient.objects.filter(name__istartswith=prefix)
+            )),
+        ):
+            latencies, query_counts = [], []
+            started = time.perf_counter()
+            for prefix in prefixes:
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    lookup(prefix)
+                    latencies.append(time.perf_counter() - start)
+                query_counts.append(len(queries))
+            results[name] = summarize(
+                latencies, query_counts, [200] * len(latencies),
+                time.perf_counter() - started
+            )
+        return results
+
+    def run_recipe_update(self, ingredients_count):
+        """
+        Правка рецепта с ingredients_count ингредиентами: меняются
+        количества у нескольких ингредиентов и заменяется один.
+        Кроме задержки считается, сколько строк ингредиентов рецепта
+        добавлено, изменено и удалено за одну правку.
+        """
+        recipe = Recipe.objects.order_by('pk').first()
+        client = self.client_for(recipe.author_id)
+        ingredient_ids = self.rng.sample(
+            list(Ingredient.objects.values_list('pk', flat=True)),
+            ingredients_count + self.requests_count + self.warmup
+        )
+        current = {
+            ingredient_id: 1 for ingredient_id in ingredient_ids[
+                :ingredients_count
+            ]
+        }
+        spare = ingredient_ids[ingredients_count:]
+        tags = list(Tag.objects.values_list('pk', flat=True)[:2])
+
+        def make_request():
+            for ingredient_id in self.rng.sample(list(current), 3):
+                current[ingredient_id] += 1
+            current.pop(self.rng.choice(list(current)))
+            current[spare.pop()] = 1
+            return client, 'patch', f'/api/recipes/{recipe.pk}/', {
+                'data': {
+                    'name': recipe.name, 'text': recipe.text,
+                    'cooking_time': recipe.cooking_time, 'tags': tags,
+                    'ingredients': [
+                        {'id': ingredient_id, 'amount': amount}
+                        for ingredient_id, amount in current.items()
+                    ],
+                },
+                'content_type': 'application/json',
+            }
+
+        for _ in range(self.warmup):
+            client_, method, url, kwargs = make_request()
+            self.request(client_, method, url, **kwargs)
+        rows = IngredientInRecipe.objects.filter(recipe=recipe)
+        latencies, query_counts, statuses = [], [], []
+        churn = dict.fromkeys(('inserted', 'updated', 'deleted'), 0)
+        elapsed = 0.0
+        for _ in range(self.requests_count):
+            client_, method, url, kwargs = make_request()
+            before = dict(rows.values_list('pk', 'amount'))
+            status, latency, queries = self.request(
+                client_, method, url, **kwargs
+            )
+            after = dict(rows.values_list('pk', 'amount'))
+            elapsed += latency
+            latencies.append(latency)
+            query_counts.append(len(queries))
+            statuses.append(status)
+            churn['inserted'] += len(after.keys() - before.keys())
+            churn['deleted'] += len(before.keys() - after.keys())
+            churn['updated'] += sum(
+                before[pk] != after[pk] for pk in after.keys() & before.keys()
+            )
+        result = summarize(latencies, query_counts, statuses, elapsed)
+        result['ingredients'] = ingredients_count
+        result['ingredient_rows_per_request'] = {
+            change: round(count / self.requests_count, 2)
+            for change, count in churn.items()
+        }
+        return result
+
+    def run_server_concurrency(self, workers, concurrency, db_latency):
+        """
+        Чтение под WSGI и под ASGI при одинаковом числе рабочих:
+        WSGI-рабочий обрабатывает один запрос за раз, ASGI-рабочий —
+        цикл событий с concurrency запросами в полёте и пулом потоков
+        базы (ASYNC_DB_THREADS). Рабочие — потоки одного процесса,
+        задержка сети до базы имитируется паузой db_latency.
+        """
+        scenarios = self.scenarios()
+        urls = [
+            scenarios[self.rng.choice(CONCURRENCY_SCENARIOS)]()[2]
+            for _ in range(self.requests_count + self.warmup)
+        ]
+        with DatabaseLatency(db_latency):
+            # Оба сервера начинают с пустого кэша ответов.
+            cache.clear()
+            results = {
+                'wsgi': self.run_wsgi_workers(urls, workers),
+            }
+            cache.clear()
+            with override_settings(ROOT_URLCONF='foodgram.asgi_urls'):
+                results['asgi'] = self.run_asgi_workers(
+                    urls, workers, concurrency
+                )
+        results['settings'] = {
+            'workers': workers,
+            'concurrency': concurrency,
+            'db_latency_ms': db_latency * 1000,
+            'async_db_threads': settings.ASYNC_DB_THREADS,
+        }
+        return results
+
+    def run_wsgi_workers(self, urls, workers):
+        def get(url):
+            start = time.perf_counter()
+            try:
+                response = Client().get(url)
+            finally:
+                connections.close_all()
+            return (
+                response.status_code, time.perf_counter() - start,
+                get_query_count(response)
+            )
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(get, urls[:self.warmup]))
+            started = time.perf_counter()
+            results = list(pool.map(get, urls[self.warmup:]))
+        return self.summarize_results(results, time.perf_counter() - started)
+
+    def run_asgi_workers(self, urls, workers, concurrency):
+        async def get(url, semaphore):
+            async with semaphore:
+                start = time.perf_counter()
+                response = await AsyncClient().get(url)
+                return (
+                    response.status_code, time.perf_counter() - start,
+                    get_query_count(response)
+                )
+
+        async def worker(worker_urls):
+            semaphore = asyncio.Semaphore(concurrency)
+            return await asyncio.gather(
+                *(get(url, semaphore) for url in worker_urls)
+            )
+
+        def run_worker(worker_urls):
+            return asyncio.run(worker(worker_urls))
+
+        measured = urls[self.warmup:]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            run_worker(urls[:self.warmup])
+            started = time.perf_counter()
+            results = [
+                result
+                for worker_results in pool.map(
+                    run_worker,
+                    [measured[number::workers] for number in range(workers)]
+                )
+                for result in worker_results
+            ]
+        return self.summarize_results(results, time.perf_counter() - started)
+
+    @staticmethod
+    def summarize_results(results, elapsed):
+        statuses, latencies, query_counts = zip(*results)
+        return summarize(
+            list(latencies), list(query_counts), list(statuses), elapsed
+        )
@@ -0,0 +1,164 @@
+import time
+from hashlib import md5
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+from recipes.models import Favorite, ShoppingCart, Tag
+from users.models import Follow
+from .constants import RECIPES_CACHE_TIMEOUT, RECIPES_VERSION, TAGS_VERSION
+
+USER_FILTERS = ('is_favorited', 'is_in_shopping_cart')
+
+
+def get_version(name):
+    """
+    Версия ресурса — время его последнего изменения в наносекундах.
+    Если версии нет в кэше, ею становится текущее время, поэтому после
+    очистки кэша прежние значения не повторяются.
+    """
+    return cache.get_or_set(f'version:{name}', time.time_ns, None)
+
+
+def bump_version(name):
+    """
+    Отмечает изменение ресурса после фиксации транзакции, чтобы ответ,
+    собранный до записи связанных строк, не получил новую версию.
+    """
+    transaction.on_commit(
+        lambda: cache.set(f'version:{name}', time.time_ns(), None)
+    )
+
+
+def get_tag_ids(slugs):
+    """id тегов по слагам; соответствие кэшируется до изменения тегов."""
+    key = f'tag_ids:{get_version(TAGS_VERSION)}'
+    tag_ids = cache.get(key)
+    if tag_ids is None:
+        tag_ids = dict(Tag.objects.values_list('slug', 'id'))
+        cache.set(key, tag_ids, RECIPES_CACHE_TIMEOUT)
+    return {tag_ids[slug] for slug in slugs if slug in tag_ids}
+
+
+def get_user_version_name(user):
+    """Версия избранного, корзины и подписок пользователя."""
+    return f'user:{user.pk}'
+
+
+def get_cache_key(request):
+    """Ключ из пути, нормализованных параметров запроса и поколения."""
+    params = '&'.join(
+        f'{name}={",".join(sorted(values))}'
+        for name, values in sorted(request.query_params.lists())
+    )
+    digest = md5(f'{request.path}?{params}'.encode()).hexdigest()
+    return f'recipes:{get_version(RECIPES_VERSION)}:{digest}'
+
+
+def is_cacheable(request):
+    """Фильтры по избранному и корзине зависят от пользователя."""
+    return request.user.is_anonymous or not any(
+        request.query_params.get(name) for name in USER_FILTERS
+    )
+
+
+def overlay_user_flags(recipes, user):
+    """
+    Накладывает на закэшированные рецепты флаги текущего пользователя:
+    избранное, корзина и подписка на автора — до трёх запросов на ответ.
+    Флаги, исключённые из ответа (?fields=, ?omit=), не запрашиваются.
+    """
+    if not recipes:
+        return
+    recipe_ids = [recipe['id'] for recipe in recipes]
+    for name, model in (
+        ('is_favorited', Favorite), ('is_in_shopping_cart', ShoppingCart)
+    ):
+        if name not in recipes[0]:
+            continue
+        marked = set(model.objects.filter(
+            user=user, recipe_id__in=recipe_ids
+        ).values_list('recipe_id', flat=True))
+        for recipe in recipes:
+            recipe[name] = recipe['id'] in marked
+    if 'is_subscribed' not in recipes[0].get('author', {}):
+        return
+    subscribed = set(Follow.objects.filter(
+        user=user, author_id__in={recipe['author']['id'] for recipe in recipes}
+    ).values_list('author_id', flat=True))
+    for recipe in recipes:
+        recipe['author']['is_subscribed'] = (
+            recipe['author']['id'] in subscribed
+        )
+
+
+class CachedResponseMixin:
+    """
+    Отдаёт список и отдельные объекты из кэша. Кэш заполняется ответами
+    анонимным пользователям, а авторизованным к ним добавляются
+    их собственные флаги.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        if not is_cacheable(request):
+            return handler(request, *args, **kwargs)
+        key = get_cache_key(request)
+        data = cache.get(key)
+        if data is None:
+            response = handler(request, *args, **kwargs)
+            if request.user.is_anonymous and response.status_code == 200:
+                cache.set(key, response.data, RECIPES_CACHE_TIMEOUT)
+            return response
+        if request.user.is_authenticated:
+            overlay_user_flags(
+                data['results'] if 'results' in data else [data],
+                request.user
+            )
+        return Response(data)
+
+
+class ConditionalGetMixin:
+    """
+    Условные GET-запросы для списка и отдельных объектов.
+    ETag и Last-Modified строятся из версий ресурсов (get_versions),
+    поэтому ответ 304 отдаётся до выборки данных и работы сериализатора.
+    """
+
+    def get_versions(self, request):
+        raise NotImplementedError
+
+    def list(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def get_conditional_response(self, handler, request, *args, **kwargs):
+        versions = self.get_versions(request)
+        etag = quote_etag('-'.join(str(version) for version in versions))
+        last_modified = max(versions) // 10 ** 9
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+            patch_vary_headers(response, ('Authorization',))
+        return response
@@ -0,0 +1,18 @@
+import os
+
+from django.conf import settings
+from django.core.checks import Warning, register
+
+
+@register()
+def check_shopping_list_font(app_configs, **kwargs):
+    """Без шрифта с кириллицей PDF-список покупок не выгружается."""
+    if os.path.exists(settings.SHOPPING_LIST_FONT_PATH):
+        return []
+    return [Warning(
+        'Шрифт для PDF-списка покупок не найден: '
+        f'{settings.SHOPPING_LIST_FONT_PATH}.',
+        hint='Установите fonts-dejavu-core или укажите '
+             'SHOPPING_LIST_FONT_PATH.',
+        id='api.W001',
+    )]
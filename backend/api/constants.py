@@ -1 +1,43 @@
 PAGE_SIZE = 6
+SHOPPING_LIST_CHUNK_SIZE = 500
+SHOPPING_LIST_FILENAME = 'shopping_cart'
+SHOPPING_LIST_PDF_SPOOL_SIZE = 1024 * 1024
+RECIPES_CACHE_TIMEOUT = 60 * 10
+RECIPES_VERSION = 'recipes'
+TAGS_VERSION = 'tags'
+MAX_IMAGE_SIZE = 10 * 1024 * 1024
+MAX_IMAGE_DIMENSION = 6000
+IMAGE_DECODE_CHUNK_SIZE = 64 * 1024
+IMAGE_SPOOL_SIZE = 1024 * 1024
+# Вариант изображения -> (максимальный размер или None, формат или None).
+IMAGE_VARIANTS = {
+    'thumbnail': ((320, 320), None),
+    'thumbnail_webp': ((320, 320), 'WEBP'),
+    'webp': (None, 'WEBP'),
+}
+FEED_FANOUT_BATCH_SIZE = 1000
+# Рецепты авторов с большим числом подписчиков не раскладываются
+# по лентам, а добавляются в ленту при чтении.
+FEED_FANOUT_MAX_FOLLOWERS = 10000
+FEED_BACKFILL_SIZE = 50
+TRANSFER_CHUNK_SIZE = 1000
+TRANSFER_MEDIA_ARCHIVE = 'media.tar'
+TRANSFER_CHUNK_NAME = 'recipes-{:05d}.ndjson'
+# Сколько изображений на процесс может ждать в очереди пула при импорте.
+TRANSFER_IMAGE_QUEUE_SIZE = 4
+# Поля рецепта в компактном списке (?compact=1): карточка без описания
+# и ингредиентов, автор без почты и признака подписки.
+RECIPE_COMPACT_FIELDS = (
+    'id',
+    'name',
+    'cooking_time',
+    'image',
+    'image_variants',
+    'tags',
+    'is_favorited',
+    'is_in_shopping_cart',
+    'author.username',
+    'author.first_name',
+    'author.last_name',
+    'author.avatar',
+)
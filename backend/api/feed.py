@@ -0,0 +1,137 @@
+from django.contrib.auth import get_user_model
+
+from recipes.models import FeedEntry, Recipe
+from users.models import Follow
+from .constants import (
+    FEED_BACKFILL_SIZE,
+    FEED_FANOUT_BATCH_SIZE,
+    FEED_FANOUT_MAX_FOLLOWERS,
+)
+
+User = get_user_model()
+
+
+def is_fanned_out(author_id):
+    """Рецепты автора раскладываются по лентам при публикации."""
+    return User.objects.filter(
+        pk=author_id, followers_count__lte=FEED_FANOUT_MAX_FOLLOWERS
+    ).exists()
+
+
+def fan_out_recipe(recipe_id, author_id, pub_date):
+    fan_out_recipes([(recipe_id, author_id, pub_date)])
+
+
+def fan_out_recipes(recipes):
+    """
+    Добавляет рецепты — тройки (id, id автора, дата публикации) —
+    в ленты подписчиков их авторов пачками по FEED_FANOUT_BATCH_SIZE,
+    перебирая подписчиков каждого автора по ключу.
+    """
+    fanned_out = set(
+        User.objects.filter(
+            pk__in={author_id for _, author_id, _ in recipes},
+            followers_count__lte=FEED_FANOUT_MAX_FOLLOWERS
+        ).values_list('pk', flat=True)
+    )
+    for author_id in fanned_out:
+        author_recipes = [
+            (recipe_id, pub_date)
+            for recipe_id, recipe_author_id, pub_date in recipes
+            if recipe_author_id == author_id
+        ]
+        followers = Follow.objects.filter(
+            author_id=author_id
+        ).order_by('user_id')
+        last_user_id = 0
+        while True:
+            user_ids = list(
+                followers.filter(user_id__gt=last_user_id)
+                .values_list('user_id', flat=True)[:FEED_FANOUT_BATCH_SIZE]
+            )
+            if not user_ids:
+                break
+            FeedEntry.objects.bulk_create(
+                [
+                    FeedEntry(
+                        user_id=user_id, recipe_id=recipe_id,
+                        author_id=author_id, pub_date=pub_date
+                    )
+                    for user_id in user_ids
+                    for recipe_id, pub_date in author_recipes
+                ],
+                batch_size=FEED_FANOUT_BATCH_SIZE,
+                ignore_conflicts=True
+            )
+            last_user_id = user_ids[-1]
+
+
+def backfill_feed(user_id, author_id):
+    """Добавляет в ленту последние рецепты нового автора из подписок."""
+    if not is_fanned_out(author_id):
+        return
+    recipes = Recipe.objects.filter(author_id=author_id).order_by(
+        '-pub_date'
+    ).values_list('pk', 'pub_date')[:FEED_BACKFILL_SIZE]
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(
+                user_id=user_id, recipe_id=recipe_id,
+                author_id=author_id, pub_date=pub_date
+            )
+            for recipe_id, pub_date in recipes
+        ],
+        ignore_conflicts=True
+    )
+
+
+def backfill_followers(author_id):
+    """
+    Рецепты, опубликованные, пока у автора было больше
+    FEED_FANOUT_MAX_FOLLOWERS подписчиков, в ленты не раскладывались.
+    Когда автор опускается до порога, последние FEED_BACKFILL_SIZE его
+    рецептов раскладываются по лентам всех подписчиков. Пропуски ищутся
+    в ленте одного подписчика, поэтому обычная отписка стоит нескольких
+    запросов.
+    """
+    if not is_fanned_out(author_id):
+        return
+    recipes = list(
+        Recipe.objects.filter(author_id=author_id).order_by('-pub_date')
+        .values_list('pk', 'pub_date')[:FEED_BACKFILL_SIZE]
+    )
+    follower_id = Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True).first()
+    if not recipes or follower_id is None:
+        return
+    if FeedEntry.objects.filter(
+        user_id=follower_id, recipe_id__in=[pk for pk, _ in recipes]
+    ).count() == len(recipes):
+        return
+    fan_out_recipes([
+        (recipe_id, author_id, pub_date) for recipe_id, pub_date in recipes
+    ])
+
+
+def get_feed_sources(user):
+    """
+    Части ленты: записи FeedEntry пользователя и рецепты авторов
+    с большим числом подписчиков, которые читаются напрямую.
+    Каждая часть — пара (queryset, поля даты публикации и id рецепта).
+    """
+    sources = [(
+        FeedEntry.objects.filter(user=user),
+        ('pub_date', 'recipe_id')
+    )]
+    popular_authors = list(
+        Follow.objects.filter(
+            user=user, author__followers_count__gt=FEED_FANOUT_MAX_FOLLOWERS
+        ).values_list('author_id', flat=True)
+    )
+    if popular_authors:
+        sources.append((
+            Recipe.objects.filter(author_id__in=popular_authors),
+            ('pub_date', 'pk')
+        ))
+    return sources
@@ -1,14 +1,72 @@
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, TrigramSimilarity
+)
+from django.db import connection
+from django import forms
+from django.db.models import (
+    Case, Count, Exists, F, IntegerField, OuterRef, Q, Value, When
+)
 from django_filters import rest_framework as filters
 
-from recipes.models import Ingredient, Recipe
+from recipes.ingredient_index import ingredient_index
+from recipes.constants import SEARCH_CONFIG
+from recipes.models import Ingredient, IngredientInRecipe, Recipe
+from .cache import get_tag_ids
+
+TAGS_MODE_ANY = 'any'
+TAGS_MODE_ALL = 'all'
+
+
+class MultipleValueField(forms.MultipleChoiceField):
+    """Список значений без проверки по списку вариантов."""
+    def valid_value(self, value):
+        return True
+
+
+class MultipleValueFilter(filters.MultipleChoiceFilter):
+    field_class = MultipleValueField
 
 
 class IngredientFilter(filters.FilterSet):
     name = filters.CharFilter(field_name='name', lookup_expr='istartswith')
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Ingredient
-        fields = ['name']
+        fields = ['name', 'search']
+
+    def filter_search(self, ingredients, name, value):
+        """
+        Нечёткий поиск: сначала совпадения по префиксу, затем по подстроке,
+        затем похожие по триграммам (pg_trgm, индекс GIN).
+        На других СУБД ранжирует индекс ингредиентов в памяти.
+        """
+        if connection.vendor != 'postgresql':
+            return self.rank_in_memory(ingredients, value)
+        return ingredients.filter(
+            Q(name__icontains=value) | Q(name__trigram_similar=value)
+        ).annotate(
+            match_rank=Case(
+                When(name__istartswith=value, then=Value(0)),
+                When(name__icontains=value, then=Value(1)),
+                default=Value(2),
+                output_field=IntegerField(),
+            ),
+            similarity=TrigramSimilarity('name', value),
+        ).order_by('match_rank', '-similarity', 'name')
+
+    @staticmethod
+    def rank_in_memory(ingredients, value):
+        ranked_ids = ingredient_index.rank(value)
+        if not ranked_ids:
+            return ingredients.none()
+        return ingredients.filter(pk__in=ranked_ids).order_by(Case(
+            *(
+                When(pk=pk, then=Value(position))
+                for position, pk in enumerate(ranked_ids)
+            ),
+            output_field=IntegerField(),
+        ))
 
 
 class RecipeFilter(filters.FilterSet):
@@ -17,18 +75,73 @@ class RecipeFilter(filters.FilterSet):
         method='filter_is_in_shopping_cart'
     )
     author = filters.NumberFilter(field_name='author__id')
-    tags = filters.AllValuesMultipleFilter(field_name='tags__slug')
+    tags = MultipleValueFilter(method='filter_tags')
+    tags_mode = filters.ChoiceFilter(
+        choices=((TAGS_MODE_ANY, 'Любой из тегов'),
+                 (TAGS_MODE_ALL, 'Все теги')),
+        method='filter_tags_mode'
+    )
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Recipe
-        fields = ['is_favorited', 'is_in_shopping_cart', 'author', 'tags']
+        fields = [
+            'is_favorited', 'is_in_shopping_cart', 'author', 'tags',
+            'tags_mode', 'search'
+        ]
+
+    def filter_tags(self, recipes, name, slugs):
+        """
+        Слаги переводятся в id по кэшу, рецепты отбираются одним EXISTS
+        по таблице связи, поэтому строки рецептов не дублируются
+        и DISTINCT не нужен. При ?tags_mode=all рецепт должен иметь
+        все переданные теги.
+        """
+        tag_ids = get_tag_ids(slugs)
+        match_all = self.form.cleaned_data.get('tags_mode') == TAGS_MODE_ALL
+        if not tag_ids or (match_all and len(tag_ids) < len(set(slugs))):
+            return recipes.none()
+        recipe_tags = Recipe.tags.through.objects.filter(
+            recipe=OuterRef('pk'), tag_id__in=tag_ids
+        )
+        if match_all and len(tag_ids) > 1:
+            recipe_tags = recipe_tags.values('recipe').annotate(
+                tags_count=Count('tag_id')
+            ).filter(tags_count=len(tag_ids))
+        return recipes.filter(Exists(recipe_tags))
+
+    def filter_tags_mode(self, recipes, name, value):
+        return recipes
+
+    def filter_search(self, recipes, name, value):
+        """
+        Полнотекстовый поиск по названию, ингредиентам и описанию
+        с русской морфологией по сохранённому вектору (индекс GIN).
+        На других СУБД ищет подстроку.
+        """
+        if connection.vendor != 'postgresql':
+            return recipes.annotate(
+                ingredient_match=Exists(IngredientInRecipe.objects.filter(
+                    recipe=OuterRef('pk'), ingredient__name__icontains=value
+                ))
+            ).filter(
+                Q(name__icontains=value)
+                | Q(text__icontains=value)
+                | Q(ingredient_match=True)
+            )
+        query = SearchQuery(
+            value, config=SEARCH_CONFIG, search_type='websearch'
+        )
+        return recipes.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        ).order_by('-search_rank', '-pub_date')
 
     def filter_is_favorited(self, recipes, name, value):
         if self.request.user.is_authenticated and value:
-            return recipes.filter(favorites__user=self.request.user)
+            return recipes.filter(is_favorited=True)
         return recipes
 
     def filter_is_in_shopping_cart(self, recipes, name, value):
         if self.request.user.is_authenticated and value:
-            return recipes.filter(shopping_carts__user=self.request.user)
+            return recipes.filter(is_in_shopping_cart=True)
         return recipes
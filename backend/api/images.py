@@ -0,0 +1,131 @@
+import base64
+import os
+from binascii import Error as BinasciiError
+from io import BytesIO
+from tempfile import SpooledTemporaryFile
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageFile
+
+from .constants import (
+    IMAGE_DECODE_CHUNK_SIZE,
+    IMAGE_SPOOL_SIZE,
+    IMAGE_VARIANTS,
+)
+from .tasks import run_in_background
+
+
+class ImageDecodeError(ValueError):
+    pass
+
+
+class ImageDimensionsError(ValueError):
+    def __init__(self, size):
+        super().__init__(size)
+        self.size = size
+
+
+def get_decoded_size(encoded):
+    """Размер данных base64 после декодирования, без декодирования."""
+    return len(encoded) * 3 // 4 - encoded[-2:].count('=')
+
+
+def decode_base64_image(encoded, max_dimension):
+    """
+    Декодирует base64 частями во временный файл, который уходит на диск
+    при превышении IMAGE_SPOOL_SIZE. Первые части передаются парсеру
+    Pillow, и как только из заголовка известны размеры изображения,
+    они проверяются — до декодирования остальных данных. Если Pillow
+    сам отвергает заголовок как «бомбу распаковки», размеры тоже
+    считаются недопустимыми.
+    """
+    encoded = ''.join(encoded.split())
+    buffer = SpooledTemporaryFile(max_size=IMAGE_SPOOL_SIZE)
+    parser = ImageFile.Parser()
+    size = None
+    try:
+        for start in range(0, len(encoded), IMAGE_DECODE_CHUNK_SIZE):
+            chunk = base64.b64decode(
+                encoded[start:start + IMAGE_DECODE_CHUNK_SIZE], validate=True
+            )
+            if size is None:
+                parser.feed(chunk)
+                if parser.image is not None:
+                    size = parser.image.size
+                    if max(size) > max_dimension:
+                        raise ImageDimensionsError(size)
+            buffer.write(chunk)
+    except BinasciiError as error:
+        buffer.close()
+        raise ImageDecodeError(error)
+    except ImageDimensionsError:
+        buffer.close()
+        raise
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning):
+        buffer.close()
+        raise ImageDimensionsError(size)
+    buffer.seek(0)
+    return buffer
+
+
+def get_variant_name(name, variant):
+    _, image_format = IMAGE_VARIANTS[variant]
+    root, ext = os.path.splitext(name)
+    if image_format is not None:
+        ext = f'.{image_format.lower()}'
+    return f'{root}_{variant}{ext}'
+
+
+def generate_variants(storage, name):
+    """Создаёт уменьшенные копии и WebP-версии изображения."""
+    missing = {
+        variant: get_variant_name(name, variant) for variant in IMAGE_VARIANTS
+    }
+    missing = {
+        variant: variant_name for variant, variant_name in missing.items()
+        if not storage.exists(variant_name)
+    }
+    if not missing:
+        return
+    with storage.open(name) as file:
+        image = Image.open(file)
+        image.load()
+    # Имя варианта строится от хэша исходного файла, а не от содержимого.
+    save = getattr(storage, 'save_derived', storage.save)
+    for variant, variant_name in missing.items():
+        max_size, image_format = IMAGE_VARIANTS[variant]
+        image_format = image_format or image.format
+        variant_image = image.copy()
+        if max_size is not None:
+            variant_image.thumbnail(max_size)
+        if image_format in ('WEBP', 'JPEG') and variant_image.mode not in (
+            'RGB', 'RGBA'
+        ):
+            variant_image = variant_image.convert('RGBA')
+        if image_format == 'JPEG' and variant_image.mode == 'RGBA':
+            variant_image = variant_image.convert('RGB')
+        output = BytesIO()
+        variant_image.save(output, format=image_format)
+        save(variant_name, ContentFile(output.getvalue()))
+
+
+def store_image(name, content):
+    """
+    Проверяет изображение, сохраняет его в хранилище и создаёт варианты.
+    Выполняется в пуле процессов при импорте рецептов; возвращает
+    имя сохранённого файла.
+    """
+    with Image.open(BytesIO(content)) as image:
+        image.verify()
+    name = default_storage.save(name, ContentFile(content))
+    generate_variants(default_storage, name)
+    return name
+
+
+def schedule_variants(field_file):
+    """Ставит создание вариантов изображения в фоновый пул."""
+    if field_file:
+        run_in_background(
+            generate_variants, field_file.storage, field_file.name
+        )
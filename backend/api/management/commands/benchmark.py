@@ -0,0 +1,149 @@
+import json
+import subprocess
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import (
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+
+from api.benchmarks import SCENARIOS, Benchmark, seed_dataset
+
+BENCHMARK_SETTINGS = {
+    'CACHES': {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'benchmark',
+        }
+    },
+    'QUERY_BUDGET_STRICT': False,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway test database with synthetic data, drive the API '
+        'hot paths through the Django test client and print a JSON report'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--recipes', type=int, default=2000)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--follows-per-user', type=int, default=20)
+        parser.add_argument('--favorites-per-user', type=int, default=20)
+        parser.add_argument('--cart-per-user', type=int, default=10)
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Measured requests per scenario'
+        )
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument(
+            '--update-ingredients', type=int, default=30,
+            help='Ingredients in the recipe edited by recipe_update'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Workers per server in server_concurrency'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=32,
+            help='Requests in flight per ASGI worker in server_concurrency'
+        )
+        parser.add_argument(
+            '--db-latency', type=float, default=2.0,
+            help='Simulated database round trip in ms for server_concurrency'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--scenario', action='append', dest='scenarios',
+            choices=SCENARIOS,
+            help='Run only the given scenarios (repeatable)'
+        )
+        parser.add_argument('--output', help='Write the report to a file')
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help='Keep the test database between runs'
+        )
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        media_root = tempfile.mkdtemp(prefix='benchmark-media-')
+        try:
+            with override_settings(
+                MEDIA_ROOT=media_root, **BENCHMARK_SETTINGS
+            ):
+                connection.creation.create_test_db(
+                    verbosity=0, autoclobber=True, keepdb=options['keepdb']
+                )
+                report = self.run(options)
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options['keepdb']
+            )
+            teardown_test_environment()
+        report_json = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(report_json)
+        else:
+            self.stdout.write(report_json)
+
+    def run(self, options):
+        started = time.perf_counter()
+        seed_dataset(
+            options['users'], options['recipes'],
+            options['ingredients_per_recipe'], options['follows_per_user'],
+            options['favorites_per_user'], options['cart_per_user'],
+            options['seed']
+        )
+        seed_seconds = time.perf_counter() - started
+        benchmark = Benchmark(
+            options['requests'], options['warmup'], options['seed']
+        )
+        scenarios = {
+            name: lambda make_request=make_request: benchmark.run_scenario(
+                make_request
+            )
+            for name, make_request in benchmark.scenarios().items()
+        }
+        scenarios['ingredient_lookup'] = benchmark.run_ingredient_lookup
+        scenarios['recipe_update'] = lambda: benchmark.run_recipe_update(
+            options['update_ingredients']
+        )
+        scenarios['server_concurrency'] = (
+            lambda: benchmark.run_server_concurrency(
+                options['workers'], options['concurrency'],
+                options['db_latency'] / 1000
+            )
+        )
+        selected = options['scenarios'] or SCENARIOS
+        return {
+            'commit': self.get_commit(),
+            'database': connection.vendor,
+            'dataset': {
+                name: options[name] for name in (
+                    'users', 'recipes', 'ingredients_per_recipe',
+                    'follows_per_user', 'favorites_per_user',
+                    'cart_per_user', 'seed'
+                )
+            },
+            'seed_seconds': round(seed_seconds, 2),
+            'requests_per_scenario': options['requests'],
+            'scenarios': {name: scenarios[name]() for name in selected},
+        }
+
+    @staticmethod
+    def get_commit():
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,74 @@
+import os
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.constants import IMAGE_VARIANTS
+from api.images import get_variant_name
+from recipes.models import Recipe
+
+User = get_user_model()
+
+MEDIA_DIRECTORIES = {
+    Recipe._meta.get_field('image').upload_to,
+    User._meta.get_field('avatar').upload_to,
+}
+
+
+class Command(BaseCommand):
+    help = 'Delete media files not referenced by recipes or users'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true')
+        parser.add_argument(
+            '--grace-period', type=int, default=60 * 60,
+            help='Keep files modified less than this many seconds ago'
+        )
+
+    def get_referenced_names(self):
+        names = set(
+            Recipe.objects.exclude(image='').values_list('image', flat=True)
+        )
+        names.update(
+            User.objects.exclude(avatar='').exclude(avatar__isnull=True)
+            .values_list('avatar', flat=True)
+        )
+        return names | {
+            get_variant_name(name, variant)
+            for name in names for variant in IMAGE_VARIANTS
+        }
+
+    def handle(self, *args, **options):
+        # Файлы свежих загрузок могут ещё не попасть в базу
+        # до фиксации транзакции, поэтому их не трогаем.
+        keep_after = timezone.now() - timedelta(
+            seconds=options['grace_period']
+        )
+        referenced = self.get_referenced_names()
+        deleted_count = freed_size = 0
+        for directory in MEDIA_DIRECTORIES:
+            if not default_storage.exists(directory):
+                continue
+            _, files = default_storage.listdir(directory)
+            for filename in files:
+                name = os.path.join(directory, filename)
+                if name in referenced:
+                    continue
+                if default_storage.get_modified_time(name) > keep_after:
+                    continue
+                freed_size += default_storage.size(name)
+                deleted_count += 1
+                if options['dry_run']:
+                    self.stdout.write(f'  {name}')
+                else:
+                    default_storage.delete(name)
+        if options['dry_run']:
+            message = 'Файлов к удалению: {}, байт: {}'
+        else:
+            message = 'Удалено файлов: {}, освобождено байт: {}'
+        self.stdout.write(self.style.SUCCESS(
+            message.format(deleted_count, freed_size)
+        ))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from api.constants import TRANSFER_CHUNK_SIZE
+from api.transfer import export_recipes
+
+
+class Command(BaseCommand):
+    help = 'Export recipes to NDJSON chunks and a media archive'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory')
+        parser.add_argument(
+            '--chunk-size', type=int, default=TRANSFER_CHUNK_SIZE,
+            help='Recipes per NDJSON file'
+        )
+
+    def handle(self, *args, **options):
+        exported = export_recipes(
+            options['directory'], options['chunk_size'],
+            progress=lambda count: self.stderr.write(
+                f'Выгружено рецептов: {count}'
+            )
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Рецепты успешно выгружены: {exported}'
+        ))
@@ -0,0 +1,40 @@
+import os
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from api.utils import SHOPPING_LIST_EXPORTERS, get_shopping_lists_rows
+
+User = get_user_model()
+
+EXPORTERS = {exporter.format: exporter for exporter in SHOPPING_LIST_EXPORTERS}
+
+
+class Command(BaseCommand):
+    help = 'Export shopping lists of many users in one pass'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format', choices=sorted(EXPORTERS), default='txt'
+        )
+        parser.add_argument('--output', default='shopping_lists')
+        parser.add_argument('--users', nargs='*', type=int)
+
+    def handle(self, *args, **options):
+        exporter = EXPORTERS[options['format']]()
+        users = User.objects.all()
+        if options['users']:
+            users = users.filter(pk__in=options['users'])
+        os.makedirs(options['output'], exist_ok=True)
+        exported_count = 0
+        for user_id, rows in get_shopping_lists_rows(users.values('pk')):
+            file_path = os.path.join(
+                options['output'], f'{user_id}.{exporter.format}'
+            )
+            with open(file_path, 'wb') as file:
+                for chunk in exporter.export(rows):
+                    file.write(chunk)
+            exported_count += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Списки покупок выгружены: {exported_count}'
+        ))
@@ -0,0 +1,32 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from api.images import generate_variants
+from recipes.models import Recipe
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Create thumbnails and WebP variants for existing images'
+
+    def handle(self, *args, **options):
+        images = [
+            recipe.image for recipe in Recipe.objects.only('image')
+        ] + [
+            user.avatar
+            for user in User.objects.exclude(avatar='').only('avatar')
+        ]
+        processed_count = 0
+        for image in images:
+            if not image:
+                continue
+            try:
+                generate_variants(image.storage, image.name)
+            except (OSError, ValueError) as error:
+                self.stderr.write(f'{image.name}: {error}')
+                continue
+            processed_count += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано изображений: {processed_count}'
+        ))
@@ -0,0 +1,60 @@
+import os
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from api.constants import TRANSFER_CHUNK_SIZE
+from api.transfer import RecipeImporter
+
+User = get_user_model()
+
+MAX_REPORTED_ERRORS = 20
+
+
+class Command(BaseCommand):
+    help = 'Import recipes exported by export_recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory')
+        parser.add_argument(
+            '--batch-size', type=int, default=TRANSFER_CHUNK_SIZE
+        )
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Processes for image decoding and saving'
+        )
+        parser.add_argument(
+            '--author',
+            help='Username to assign recipes whose author does not exist'
+        )
+
+    def handle(self, *args, **options):
+        if not os.path.isdir(options['directory']):
+            raise CommandError(f'Нет каталога {options["directory"]}')
+        default_author = None
+        if options['author']:
+            default_author = User.objects.filter(
+                username=options['author']
+            ).first()
+            if default_author is None:
+                raise CommandError(
+                    f'Нет пользователя {options["author"]}'
+                )
+        importer = RecipeImporter(
+            options['directory'], options['batch_size'], options['workers'],
+            default_author=default_author,
+            progress=lambda count: self.stderr.write(
+                f'Загружено рецептов: {count}'
+            )
+        )
+        importer.run()
+        for error in importer.errors[:MAX_REPORTED_ERRORS]:
+            self.stderr.write(error)
+        if len(importer.errors) > MAX_REPORTED_ERRORS:
+            self.stderr.write(
+                f'... и ещё {len(importer.errors) - MAX_REPORTED_ERRORS}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Рецепты успешно загружены: {importer.imported}, '
+            f'ошибок: {len(importer.errors)}'
+        ))
@@ -0,0 +1,237 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+METRICS = (
+    ('requests_total', 'counter', 'Число запросов'),
+    ('request_seconds_total', 'counter', 'Суммарное время ответа'),
+    ('db_queries_total', 'counter', 'Число SQL-запросов'),
+    ('db_seconds_total', 'counter', 'Суммарное время SQL-запросов'),
+    ('serialize_seconds_total', 'counter', 'Суммарное время сериализации'),
+    ('response_bytes_total', 'counter', 'Суммарный размер ответов'),
+    ('query_budget_exceeded_total', 'counter',
+     'Число ответов сверх бюджета SQL-запросов'),
+)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class RequestStats:
+    """Число и время SQL-запросов и время сериализации одного запроса."""
+    def __init__(self):
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.serialize_seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_queries += 1
+            self.db_seconds += time.perf_counter() - start
+
+    def track_serialization(self, to_representation):
+        """Время to_representation без SQL-запросов внутри него."""
+        @wraps(to_representation)
+        def wrapper(*args, **kwargs):
+            start, db_start = time.perf_counter(), self.db_seconds
+            try:
+                return to_representation(*args, **kwargs)
+            finally:
+                self.serialize_seconds += (
+                    time.perf_counter() - start
+                    - (self.db_seconds - db_start)
+                )
+        return wrapper
+
+
+class MetricsRegistry:
+    """Накопленные метрики процесса по маршрутам."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = defaultdict(float)
+
+    def observe(self, route, method, status, stats, seconds, size,
+                over_budget):
+        route_labels = (('route', route),)
+        request_labels = route_labels + (
+            ('method', method), ('status', status)
+        )
+        with self.lock:
+            self.values['requests_total', request_labels] += 1
+            self.values['request_seconds_total', route_labels] += seconds
+            self.values['db_queries_total', route_labels] += stats.db_queries
+            self.values['db_seconds_total', route_labels] += stats.db_seconds
+            self.values['serialize_seconds_total', route_labels] += (
+                stats.serialize_seconds
+            )
+            if size is not None:
+                self.values['response_bytes_total', route_labels] += size
+            if over_budget:
+                self.values['query_budget_exceeded_total', route_labels] += 1
+
+    def render(self):
+        with self.lock:
+            values = sorted(self.values.items())
+        lines = []
+        for name, metric_type, description in METRICS:
+            lines.append(f'# HELP foodgram_{name} {description}')
+            lines.append(f'# TYPE foodgram_{name} {metric_type}')
+            for (metric, labels), value in values:
+                if metric != name:
+                    continue
+                label_text = ','.join(
+                    f'{label}="{escape_label(label_value)}"'
+                    for label, label_value in labels
+                )
+                lines.append(f'foodgram_{name}{{{label_text}}} {value:g}')
+        return '\n'.join(lines) + '\n'
+
+
+def escape_label(value):
+    return (
+        str(value).replace('\\', r'\\').replace('"', r'\"')
+        .replace('\n', r'\n')
+    )
+
+
+registry = MetricsRegistry()
+
+
+def get_route(request):
+    """Имя маршрута вида api:recipe-list, не зависящее от id в пути."""
+    match = request.resolver_match
+    if match is None:
+        return 'unmatched'
+    return match.view_name
+
+
+# Статистика текущего запроса. Контекст копируется в потоки
+# sync_to_async, поэтому запросы из пула потоков ASGI тоже учитываются.
+current_stats = ContextVar('current_stats', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats(execute, sql, params, many, context)
+
+
+def install_query_recorder(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@receiver(connection_created)
+def install_query_recorder_on_connect(connection, **kwargs):
+    install_query_recorder(connection)
+
+
+class MetricsMiddleware:
+    """
+    Считает SQL-запросы и их время, время сериализации и размер ответа
+    по маршрутам, отдаёт их в заголовке Server-Timing и в /metrics
+    и сверяет число запросов на чтение с бюджетом маршрута (QUERY_BUDGETS).
+    Запросы потоковых ответов, выполняемые при отдаче тела, не учитываются.
+    Работает и в синхронной, и в асинхронной цепочке middleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        stats, token, start = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.finish(request, response, stats, start)
+
+    async def __acall__(self, request):
+        stats, token, start = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.finish(request, response, stats, start)
+
+    @staticmethod
+    def start(request):
+        for connection in connections.all():
+            install_query_recorder(connection)
+        stats = RequestStats()
+        request.metrics = stats
+        return stats, current_stats.set(stats), time.perf_counter()
+
+    @staticmethod
+    def finish(request, response, stats, start):
+        seconds = time.perf_counter() - start
+        route = get_route(request)
+        size = None if response.streaming else len(response.content)
+        response['Server-Timing'] = (
+            f'db;dur={stats.db_seconds * 1000:.1f};'
+            f'desc="{stats.db_queries} queries", '
+            f'serialize;dur={stats.serialize_seconds * 1000:.1f}, '
+            f'total;dur={seconds * 1000:.1f}'
+        )
+        budget = None
+        if request.method in ('GET', 'HEAD'):
+            budget = settings.QUERY_BUDGETS.get(route)
+        over_budget = budget is not None and stats.db_queries > budget
+        registry.observe(
+            route, request.method, response.status_code,
+            stats, seconds, size, over_budget
+        )
+        if over_budget:
+            message = (
+                f'{request.method} {request.path} ({route}): '
+                f'{stats.db_queries} SQL-запросов при бюджете {budget}'
+            )
+            if settings.QUERY_BUDGET_STRICT:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+
+class MetricsMixin:
+    """Учитывает время сериализации в метриках запроса."""
+
+    def get_serializer(self, *args, **kwargs):
+        return self.track_serializer(super().get_serializer(*args, **kwargs))
+
+    def track_serializer(self, serializer):
+        stats = getattr(self.request, 'metrics', None)
+        if stats is not None:
+            serializer.to_representation = stats.track_serialization(
+                serializer.to_representation
+            )
+        return serializer
+
+
+def metrics_view(request):
+    """Метрики в текстовом формате Prometheus."""
+    return HttpResponse(
+        registry.render(), content_type='text/plain; version=0.0.4'
+    )
@@ -1,8 +1,240 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from collections import OrderedDict
+
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 from .constants import PAGE_SIZE
+from .feed import get_feed_sources
 
 
 class LimitPagination(PageNumberPagination):
     page_size = PAGE_SIZE
     page_size_query_param = 'limit'
+
+
+class KeysetPagination(BasePagination):
+    """
+    Постраничный вывод по ключу: следующая страница выбирается условием
+    на поля сортировки крайней записи, а не через OFFSET, поэтому глубокие
+    страницы не замедляются. Сортировка берётся из queryset (или Meta.ordering)
+    и дополняется pk, например (-pub_date, -pk) или (username, pk).
+    Общее число записей по умолчанию не считается: ?count=exact возвращает
+    точное значение, ?count=estimate — оценку из статистики PostgreSQL.
+    """
+    page_size = PAGE_SIZE
+    page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Некорректный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+        self.count = self.get_count(queryset, request)
+        reverse, values = self.decode_cursor(request)
+
+        ordering = self.ordering
+        if reverse:
+            ordering = [self.flip(field) for field in ordering]
+        queryset = queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self.get_keyset_filter(values, reverse))
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        self.page = results[:page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, values is not None
+        return self.page
+
+    def get_paginated_response(self, data):
+        response = OrderedDict()
+        if self.count is not None:
+            response['count'] = self.count
+        response['next'] = self.get_next_link()
+        response['previous'] = self.get_previous_link()
+        response['results'] = data
+        return Response(response)
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return page_size if page_size > 0 else self.page_size
+
+    @staticmethod
+    def flip(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def get_ordering(queryset):
+        ordering = list(
+            queryset.query.order_by or queryset.model._meta.ordering
+        )
+        if not all(isinstance(field, str) for field in ordering):
+            raise TypeError(
+                'Постраничный вывод по ключу поддерживает только '
+                'сортировку по именам полей.'
+            )
+        if not {'pk', '-pk', 'id', '-id'} & set(ordering):
+            ordering.append('-pk' if ordering[0].startswith('-') else 'pk')
+        return ordering
+
+    def get_keyset_filter(self, values, reverse, ordering=None):
+        """
+        Условие «после записи с values» для сортировки (f1, f2, ...):
+        f1 > v1 OR (f1 = v1 AND f2 > v2) OR ...
+        """
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering or self.ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') != reverse else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def get_count(self, queryset, request):
+        count_mode = request.query_params.get(self.count_query_param)
+        if count_mode == 'estimate':
+            return self.estimate_count(queryset)
+        if count_mode == 'exact':
+            return queryset.count()
+        return None
+
+    @staticmethod
+    def estimate_count(queryset):
+        """
+        Оценка числа записей по статистике планировщика PostgreSQL:
+        reltuples из pg_class для всей таблицы или оценка EXPLAIN
+        для отфильтрованного запроса. На других СУБД — точный подсчёт.
+        """
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return queryset.count()
+        with connection.cursor() as cursor:
+            if not queryset.query.where:
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class '
+                    'WHERE oid = %s::regclass',
+                    [queryset.model._meta.db_table]
+                )
+            else:
+                sql, params = queryset.values('pk').query.sql_with_params()
+                cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            row = cursor.fetchone()
+        if isinstance(row[0], int):
+            return max(row[0], 0)
+        plan = row[0] if isinstance(row[0], list) else json.loads(row[0])
+        return plan[0]['Plan']['Plan Rows']
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return False, None
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            reverse, values = bool(cursor['r']), list(cursor['v'])
+        except (BinasciiError, KeyError, TypeError, UnicodeError,
+                ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return reverse, values
+
+    def encode_cursor(self, instance, reverse):
+        values = [
+            getattr(instance, field.lstrip('-')) for field in self.ordering
+        ]
+        cursor = json.dumps({'r': reverse, 'v': values}, default=str)
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            urlsafe_b64encode(cursor.encode()).decode('ascii')
+        )
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+
+class LimitOrKeysetPagination(LimitPagination):
+    """
+    Постраничный вывод по номеру страницы, а при наличии параметра
+    ?cursor (в том числе пустого, для первой страницы) — по ключу.
+    """
+    keyset_pagination_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.keyset_pagination_class.cursor_query_param in (
+            request.query_params
+        ):
+            self.keyset = self.keyset_pagination_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class FeedPagination(KeysetPagination):
+    """
+    Лента подписок по ключу (-pub_date, -pk). Каждая часть ленты
+    (get_feed_sources) выбирается по своему индексу отдельно, найденные
+    id сливаются, и рецепты страницы загружаются одним запросом
+    из queryset представления.
+    """
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        self.ordering = ['-pub_date', '-pk']
+        self.count = None
+        reverse, values = self.decode_cursor(request)
+
+        keys = set()
+        for source, fields in get_feed_sources(request.user):
+            ordering = [f'-{field}' for field in fields]
+            if values is not None:
+                source = source.filter(
+                    self.get_keyset_filter(values, reverse, ordering)
+                )
+            if reverse:
+                ordering = [self.flip(field) for field in ordering]
+            keys.update(
+                source.order_by(*ordering)
+                .values_list(*fields)[:page_size + 1]
+            )
+        keys = sorted(keys, reverse=not reverse)
+        has_more = len(keys) > page_size
+        recipe_ids = [recipe_id for _, recipe_id in keys[:page_size]]
+        recipes = queryset.in_bulk(recipe_ids)
+        self.page = [
+            recipes[recipe_id] for recipe_id in recipe_ids
+            if recipe_id in recipes
+        ]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, values is not None
+        return self.page
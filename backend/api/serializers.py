@@ -1,10 +1,12 @@
-import base64
-
 from django.contrib.auth import get_user_model
-from django.core.files.base import ContentFile
+from django.core.files import File
+from django.db import transaction
+from django.db.models import prefetch_related_objects
 from djoser.serializers import UserSerializer as BaseUserSerializer
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.relations import MANY_RELATION_KWARGS
 
 from recipes.constants import MIN_AMOUNT
 from recipes.models import (
@@ -16,6 +18,19 @@ from recipes.models import (
     Tag,
 )
 from users.models import Follow
+from .constants import (
+    IMAGE_VARIANTS,
+    MAX_IMAGE_DIMENSION,
+    MAX_IMAGE_SIZE,
+    RECIPE_COMPACT_FIELDS,
+)
+from .images import (
+    ImageDecodeError,
+    ImageDimensionsError,
+    decode_base64_image,
+    get_decoded_size,
+    get_variant_name,
+)
 from .validators import validate_ingredients, validate_tags
 
 
@@ -25,18 +40,184 @@ User = get_user_model()
 class Base64ImageField(serializers.ImageField):
     """
     Поле для работы с изображениями в формате base64.
-    Преобразует строку base64 в файловый объект.
+    Преобразует строку base64 в файловый объект, проверяя размер данных
+    и размеры изображения до полного декодирования.
     """
+    default_error_messages = {
+        'max_size': 'Размер изображения не должен превышать {max_size} байт.',
+        'max_dimension': (
+            'Размеры изображения не должны превышать '
+            '{max_dimension} пикселей по каждой стороне.'
+        ),
+    }
+
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
+            format, _, imgstr = data.partition(';base64,')
+            if get_decoded_size(imgstr) > MAX_IMAGE_SIZE:
+                self.fail('max_size', max_size=MAX_IMAGE_SIZE)
+            try:
+                buffer = decode_base64_image(imgstr, MAX_IMAGE_DIMENSION)
+            except ImageDimensionsError:
+                self.fail('max_dimension', max_dimension=MAX_IMAGE_DIMENSION)
+            except ImageDecodeError:
+                self.fail('invalid_image')
             ext = format.split('/')[-1]
-            name = f'temp.{ext}'
-            file = ContentFile(base64.b64decode(imgstr), name=name)
-            data = file
+            data = File(buffer, name=f'temp.{ext}')
+        return super().to_internal_value(data)
+
+
+class ImageVariantsField(serializers.Field):
+    """Ссылки на уменьшенные копии и WebP-версии изображения."""
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return {}
+        request = self.context.get('request')
+        variants = {}
+        for variant in IMAGE_VARIANTS:
+            url = value.storage.url(get_variant_name(value.name, variant))
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            variants[variant] = url
+        return variants
+
+
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    """Перед проверкой списка загружает все его объекты одним запросом."""
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self.child_relation.prefetch(data)
         return super().to_internal_value(data)
 
 
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField для списков: все переданные id проверяются
+    одним запросом id__in, ошибки по-прежнему выдаются по элементам.
+    """
+    def prefetch(self, values):
+        pks = set()
+        for value in values:
+            try:
+                pks.add(int(value))
+            except (TypeError, ValueError):
+                continue
+        self._resolved = self.get_queryset().in_bulk(pks)
+
+    def to_internal_value(self, data):
+        resolved = getattr(self, '_resolved', None)
+        if resolved is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return resolved[int(data)]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
+
+class BulkRelatedListSerializer(serializers.ListSerializer):
+    """
+    Перед проверкой элементов загружает объекты для всех полей
+    BulkPrimaryKeyRelatedField дочернего сериализатора, по запросу на поле.
+    """
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            for name, field in self.child.fields.items():
+                if isinstance(field, BulkPrimaryKeyRelatedField):
+                    field.prefetch(
+                        item.get(name) for item in data
+                        if isinstance(item, dict)
+                    )
+        return super().to_internal_value(data)
+
+
+class SparseFieldsMixin:
+    """
+    Выбор полей ответа при чтении: ?fields= оставляет перечисленные поля,
+    ?omit= исключает их, ?compact=1 оставляет набор compact_fields.
+    Поля вложенных сериализаторов задаются через точку (author.username).
+    id выводится всегда, неизвестные имена пропускаются.
+    """
+    fields_query_param = 'fields'
+    omit_query_param = 'omit'
+    compact_query_param = 'compact'
+    compact_fields = ()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method not in SAFE_METHODS:
+            return
+        params = request.query_params
+        if self.compact_fields and params.get(
+            self.compact_query_param
+        ) in ('1', 'true'):
+            self.keep_fields(self.compact_fields)
+        if self.fields_query_param in params:
+            self.keep_fields(
+                self.split_names(params[self.fields_query_param])
+            )
+        if self.omit_query_param in params:
+            self.omit_fields(self.split_names(params[self.omit_query_param]))
+
+    @staticmethod
+    def split_names(value):
+        return [name.strip() for name in value.split(',') if name.strip()]
+
+    @staticmethod
+    def get_nested_fields(field):
+        """Поля вложенного сериализатора (или его child при many=True)."""
+        field = getattr(field, 'child', field)
+        if isinstance(field, serializers.Serializer):
+            return field.fields
+        return None
+
+    def keep_fields(self, names):
+        nested = {}
+        for name in names:
+            name, _, nested_name = name.partition('.')
+            nested.setdefault(name, set()).add(nested_name)
+        for name in list(self.fields):
+            if name == 'id':
+                continue
+            if name not in nested:
+                self.fields.pop(name)
+                continue
+            nested_fields = self.get_nested_fields(self.fields[name])
+            if nested_fields is None or '' in nested[name]:
+                continue
+            for nested_name in list(nested_fields):
+                if nested_name != 'id' and nested_name not in nested[name]:
+                    nested_fields.pop(nested_name)
+
+    def omit_fields(self, names):
+        for name in names:
+            name, _, nested_name = name.partition('.')
+            if name == 'id' or name not in self.fields:
+                continue
+            if not nested_name:
+                self.fields.pop(name)
+                continue
+            nested_fields = self.get_nested_fields(self.fields[name])
+            if nested_fields is not None and nested_name != 'id':
+                nested_fields.pop(nested_name, None)
+
+
 class UserDetailSerializer(BaseUserSerializer):
     """Сериализатор для получения информации о пользователе"""
     avatar = Base64ImageField(required=False, allow_null=True)
@@ -49,6 +230,9 @@ class UserDetailSerializer(BaseUserSerializer):
         ) + ['avatar', 'is_subscribed']
 
     def get_is_subscribed(self, user_instance):
+        annotated = getattr(user_instance, 'is_subscribed', None)
+        if annotated is not None:
+            return annotated
         request = self.context.get('request')
         if request is not None and request.user.is_authenticated:
             return Follow.objects.filter(
@@ -59,7 +243,7 @@ class UserDetailSerializer(BaseUserSerializer):
 
 class IngredientInRecipeSerializer(serializers.ModelSerializer):
     """Сериализатор для модели IngredientInRecipe."""
-    id = serializers.PrimaryKeyRelatedField(
+    id = BulkPrimaryKeyRelatedField(
         queryset=Ingredient.objects.all(),
         source='ingredient.id'
     )
@@ -79,13 +263,16 @@ class IngredientInRecipeSerializer(serializers.ModelSerializer):
     class Meta:
         model = IngredientInRecipe
         fields = ('id', 'amount', 'name', 'measurement_unit')
+        list_serializer_class = BulkRelatedListSerializer
 
 
 class RecipeMinifiedSerializer(serializers.ModelSerializer):
     """Уменьшенная версия сериализатора для модели Recipe."""
+    image_variants = ImageVariantsField(source='image')
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'cooking_time', 'image')
+        fields = ('id', 'name', 'cooking_time', 'image', 'image_variants')
 
 
 class AvatarSerializer(serializers.ModelSerializer):
@@ -117,18 +304,20 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit')
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Сериализатор для модели Recipe."""
     author = UserDetailSerializer(read_only=True)
     image = Base64ImageField()
+    image_variants = ImageVariantsField(source='image')
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
     ingredients = IngredientInRecipeSerializer(
         many=True, source='ingredients_in_recipes'
     )
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = BulkPrimaryKeyRelatedField(
         queryset=Tag.objects.all(), many=True
     )
+    compact_fields = RECIPE_COMPACT_FIELDS
 
     class Meta:
         model = Recipe
@@ -138,6 +327,7 @@ class RecipeSerializer(serializers.ModelSerializer):
             'text',
             'cooking_time',
             'image',
+            'image_variants',
             'tags',
             'author',
             'is_favorited',
@@ -149,18 +339,25 @@ class RecipeSerializer(serializers.ModelSerializer):
         serializer.save(author=self.request.user)
 
     def get_is_favorited(self, obj):
-        request = self.context.get('request')
-        if not request.user.is_authenticated:
-            return False
-        return Favorite.objects.filter(user=request.user, recipe=obj).exists()
+        return self._get_user_relation(obj, 'is_favorited', Favorite)
 
     def get_is_in_shopping_cart(self, obj):
+        return self._get_user_relation(
+            obj, 'is_in_shopping_cart', ShoppingCart
+        )
+
+    def _get_user_relation(self, recipe, annotation, model):
+        """
+        Берёт флаг из аннотации queryset, если она есть,
+        иначе проверяет связь пользователя с рецептом отдельным запросом.
+        """
+        annotated = getattr(recipe, annotation, None)
+        if annotated is not None:
+            return annotated
         request = self.context.get('request')
-        if not request.user.is_authenticated:
+        if request is None or not request.user.is_authenticated:
             return False
-        return ShoppingCart.objects.filter(
-            user=request.user, recipe=obj
-        ).exists()
+        return model.objects.filter(user=request.user, recipe=recipe).exists()
 
     def validate_tags(self, tag_values):
         return validate_tags(tag_values)
@@ -169,12 +366,25 @@ class RecipeSerializer(serializers.ModelSerializer):
         return validate_ingredients(ingredients_value)
 
     def to_representation(self, instance):
+        # Рецепт, только что созданный или изменённый, приходит без
+        # загруженных связей: подгружаем их двумя запросами вместо
+        # запроса на каждый ингредиент. Для queryset из списка это no-op.
+        # Связи полей, исключённых из ответа, не загружаются.
+        lookups = [
+            lookup for name, lookup in (
+                ('tags', 'tags'),
+                ('ingredients', 'ingredients_in_recipes__ingredient'),
+            ) if name in self.fields
+        ]
+        prefetch_related_objects([instance], *lookups)
         representation = super().to_representation(instance)
-        representation['tags'] = TagSerializer(
-            instance.tags.all(), many=True
-        ).data
+        if 'tags' in self.fields:
+            representation['tags'] = TagSerializer(
+                instance.tags.all(), many=True
+            ).data
         return representation
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients_data = validated_data.pop('ingredients_in_recipes')
         self.validate_ingredients(ingredients_data)
@@ -185,6 +395,7 @@ class RecipeSerializer(serializers.ModelSerializer):
 
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients_data = validated_data.pop('ingredients_in_recipes', [])
         tags_data = validated_data.pop('tags', [])
@@ -192,11 +403,8 @@ class RecipeSerializer(serializers.ModelSerializer):
         self.validate_ingredients(ingredients_data)
         self.validate_tags(tags_data)
 
-        instance.tags.clear()
         instance.tags.set(tags_data)
-        IngredientInRecipe.objects.filter(recipe=instance).delete()
-
-        self._bulk_create_ingredients(instance, ingredients_data)
+        self._sync_ingredients(instance, ingredients_data)
 
         return super().update(instance, validated_data)
 
@@ -210,47 +418,52 @@ class RecipeSerializer(serializers.ModelSerializer):
             for ingredient in ingredients_data
         )
 
-
-class UserWithRecipesSerializer(BaseUserSerializer):
+    def _sync_ingredients(self, recipe, ingredients_data):
+        """
+        Приводит ингредиенты рецепта к переданным, меняя только разницу:
+        удаляет лишние строки (и повторы одного ингредиента), обновляет
+        изменившиеся количества и добавляет новые — не больше одного
+        запроса на каждое действие.
+        """
+        amounts = {
+            ingredient['ingredient']['id'].pk: ingredient['amount']
+            for ingredient in ingredients_data
+        }
+        existing = {}
+        removed = []
+        for row in recipe.ingredients_in_recipes.all():
+            if row.ingredient_id in existing:
+                removed.append(row.pk)
+            else:
+                existing[row.ingredient_id] = row
+        removed += [
+            row.pk for ingredient_id, row in existing.items()
+            if ingredient_id not in amounts
+        ]
+        changed = []
+        for ingredient_id, row in existing.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and row.amount != amount:
+                row.amount = amount
+                changed.append(row)
+        if removed:
+            IngredientInRecipe.objects.filter(pk__in=removed).delete()
+        if changed:
+            IngredientInRecipe.objects.bulk_update(changed, ['amount'])
+        self._bulk_create_ingredients(recipe, [
+            ingredient for ingredient in ingredients_data
+            if ingredient['ingredient']['id'].pk not in existing
+        ])
+
+
+class UserWithRecipesSerializer(UserDetailSerializer):
+    """
+    Сериализатор автора из подписок вместе с его рецептами.
+    Ожидает, что рецепты уже отобраны и загружены через prefetch.
+    """
     recipes = RecipeMinifiedSerializer(many=True, read_only=True)
-    is_subscribed = serializers.SerializerMethodField()
-    recipes_count = serializers.IntegerField(required=False)
-
-    class Meta:
-        model = User
-        fields = list(
-            BaseUserSerializer.Meta.fields
-        ) + ['avatar', 'is_subscribed', 'recipes', 'recipes_count']
-
-    def get_is_subscribed(self, obj):
-        request = self.context.get('request')
-        if request is not None and request.user.is_authenticated:
-            return Follow.objects.filter(
-                user=request.user, author=obj
-            ).exists()
-        return False
 
-    def get_recipes(self, user):
-        recipes = user.recipes.all()
-        recipes_limit = self.context.get('request').GET.get(
-            'recipes_limit', None
-        )
-
-        if recipes_limit is not None:
-            try:
-                recipes_limit = int(recipes_limit)
-                if recipes_limit < 0:
-                    recipes_limit = 0
-            except ValueError:
-                recipes_limit = recipes.count()
-        else:
-            recipes_limit = recipes.count()
-
-        recipes = recipes[:recipes_limit]
-        serializer = RecipeMinifiedSerializer(recipes, many=True)
-        return serializer.data
-
-    def to_representation(self, instance):
-        representation = super().to_representation(instance)
-        representation['recipes_count'] = instance.recipes.count()
-        return representation
+    class Meta(UserDetailSerializer.Meta):
+        fields = UserDetailSerializer.Meta.fields + [
+            'recipes', 'recipes_count'
+        ]
@@ -0,0 +1,80 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.models import (
+    Favorite, FeedEntry, Ingredient, IngredientInRecipe, Recipe, ShoppingCart,
+    Tag
+)
+from users.models import Follow
+from .cache import bump_version, get_user_version_name
+from .constants import RECIPES_VERSION, TAGS_VERSION
+from .feed import backfill_feed, backfill_followers, fan_out_recipe
+from .images import schedule_variants
+from .tasks import run_in_background
+
+User = get_user_model()
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=IngredientInRecipe)
+@receiver((post_save, post_delete), sender=Ingredient)
+@receiver((post_save, post_delete), sender=Tag)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipes_cache(**kwargs):
+    bump_version(RECIPES_VERSION)
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_tags_cache(**kwargs):
+    bump_version(TAGS_VERSION)
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+@receiver((post_save, post_delete), sender=Follow)
+def invalidate_user_state(instance, **kwargs):
+    bump_version(get_user_version_name(instance.user))
+
+
+@receiver((post_save, post_delete), sender=User)
+def invalidate_recipes_cache_on_user_change(update_fields=None, **kwargs):
+    """Вход пользователя меняет только last_login, кэш не сбрасывается."""
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    bump_version(RECIPES_VERSION)
+
+
+@receiver(post_save, sender=Recipe)
+def create_recipe_image_variants(instance, **kwargs):
+    schedule_variants(instance.image)
+
+
+@receiver(post_save, sender=User)
+def create_avatar_variants(instance, update_fields=None, **kwargs):
+    if update_fields and 'avatar' not in update_fields:
+        return
+    schedule_variants(instance.avatar)
+
+
+@receiver(post_save, sender=Recipe)
+def add_recipe_to_feeds(instance, created, **kwargs):
+    if created:
+        run_in_background(
+            fan_out_recipe, instance.pk, instance.author_id, instance.pub_date
+        )
+
+
+@receiver(post_save, sender=Follow)
+def add_author_to_feed(instance, created, **kwargs):
+    if created:
+        backfill_feed(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def remove_author_from_feed(instance, **kwargs):
+    FeedEntry.objects.filter(
+        user_id=instance.user_id, author_id=instance.author_id
+    ).delete()
+    # Отписка может опустить автора до порога раскладки по лентам.
+    run_in_background(backfill_followers, instance.author_id)
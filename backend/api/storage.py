@@ -0,0 +1,43 @@
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+
+def get_content_hash(content):
+    content_hash = hashlib.sha256()
+    for chunk in content.chunks():
+        content_hash.update(chunk)
+    return content_hash.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Хранилище, в котором файл называется по SHA-256 своего содержимого.
+    Одинаковые файлы хранятся один раз: если файл с таким именем уже есть,
+    запись пропускается. Имя всегда вычисляется заново, имени от клиента
+    не доверяем. Варианты изображений сохраняются через save_derived
+    под именами от хэша исходного файла.
+    Неиспользуемые файлы удаляет команда collect_media_garbage.
+    """
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        directory, basename = os.path.split(name)
+        _, ext = os.path.splitext(basename)
+        name = os.path.join(
+            directory, f'{get_content_hash(content)}{ext.lower()}'
+        )
+        return self.save_derived(name, content, max_length=max_length)
+
+    def save_derived(self, name, content, max_length=None):
+        """
+        Сохраняет файл под заданным именем, если его ещё нет.
+        Только для имён, построенных сервером из имени исходного файла.
+        """
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length=max_length)
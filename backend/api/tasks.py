@@ -0,0 +1,36 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.BACKGROUND_WORKERS,
+            thread_name_prefix='background'
+        )
+    return _executor
+
+
+def _run(func, args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Фоновая задача %s завершилась с ошибкой', func)
+    finally:
+        connections.close_all()
+
+
+def run_in_background(func, *args):
+    """
+    Выполняет func(*args) в фоновом пуле потоков после фиксации
+    транзакции, не задерживая ответ на запрос.
+    """
+    transaction.on_commit(lambda: get_executor().submit(_run, func, args))
@@ -0,0 +1,206 @@
+import base64
+import struct
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from api.constants import MAX_IMAGE_DIMENSION
+from api.serializers import Base64ImageField
+
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    ShoppingCart,
+    Tag,
+)
+from users.models import Follow
+
+User = get_user_model()
+
+RECIPES_URL = '/api/recipes/'
+RECIPES_COUNT = 12
+# Запросы страницы списка: число рецептов, рецепты с авторами, теги,
+# строки ингредиентов и сами ингредиенты; авторизованному авторы
+# с признаком подписки загружаются отдельным запросом.
+ANONYMOUS_LIST_QUERIES = 5
+AUTHENTICATED_LIST_QUERIES = 6
+# Размеры из заголовка, превышающие порог «бомбы распаковки» Pillow.
+BOMB_DIMENSION = 20000
+
+
+class RecipeListQueriesTest(TestCase):
+    """Число запросов списка рецептов не зависит от размера страницы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Автор', last_name='Рецептов', password='password'
+        )
+        cls.reader = User.objects.create_user(
+            email='reader@example.com', username='reader',
+            first_name='Читатель', last_name='Рецептов', password='password'
+        )
+        tags = [
+            Tag.objects.create(name=f'Тег {number}', slug=f'tag-{number}')
+            for number in range(2)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г'
+            )
+            for number in range(3)
+        ]
+        # bulk_create не отправляет сигналы: варианты изображений
+        # для несуществующих файлов не создаются.
+        Recipe.objects.bulk_create(
+            Recipe(
+                author=cls.author, name=f'Рецепт {number}',
+                text='Описание', cooking_time=10, image='recipes/test.png'
+            )
+            for number in range(RECIPES_COUNT)
+        )
+        recipes = list(Recipe.objects.all())
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=tag)
+            for recipe in recipes for tag in tags
+        )
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(recipe=recipe, ingredient=ingredient, amount=1)
+            for recipe in recipes for ingredient in ingredients
+        )
+        Favorite.objects.create(user=cls.reader, recipe=recipes[0])
+        ShoppingCart.objects.create(user=cls.reader, recipe=recipes[1])
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.anonymous = APIClient()
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def assert_list_queries(self, client, queries):
+        for limit in (2, 6, RECIPES_COUNT):
+            with self.subTest(limit=limit), self.assertNumQueries(queries):
+                response = client.get(
+                    RECIPES_URL, {'page': 1, 'limit': limit}
+                )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data['results']), limit)
+
+    def test_anonymous_list_queries(self):
+        self.assert_list_queries(self.anonymous, ANONYMOUS_LIST_QUERIES)
+
+    def test_authenticated_list_queries(self):
+        self.assert_list_queries(self.client, AUTHENTICATED_LIST_QUERIES)
+
+    def test_authenticated_list_flags(self):
+        results = {
+            recipe['id']: recipe for recipe in self.client.get(
+                RECIPES_URL, {'limit': RECIPES_COUNT}
+            ).data['results']
+        }
+        favorited = Favorite.objects.get(user=self.reader).recipe_id
+        in_cart = ShoppingCart.objects.get(user=self.reader).recipe_id
+        self.assertEqual(
+            [pk for pk, recipe in results.items() if recipe['is_favorited']],
+            [favorited]
+        )
+        self.assertEqual(
+            [pk for pk, recipe in results.items()
+             if recipe['is_in_shopping_cart']],
+            [in_cart]
+        )
+        self.assertTrue(all(
+            recipe['author']['is_subscribed'] for recipe in results.values()
+        ))
+
+
+def bmp_header(width, height):
+    """Заголовок BMP с заданными размерами без данных пикселей."""
+    info = struct.pack(
+        '<IiiHHIIiiII', 40, width, height, 1, 24, 0, 0, 2835, 2835, 0, 0
+    )
+    header = b'BM' + struct.pack('<IHHI', 54 + width * height * 3, 0, 0, 54)
+    return header + info + bytes(64)
+
+
+class Base64ImageFieldTest(TestCase):
+    """Размеры изображения проверяются по заголовку."""
+
+    def assert_max_dimension(self, width, height):
+        data = 'data:image/bmp;base64,' + base64.b64encode(
+            bmp_header(width, height)
+        ).decode()
+        with self.assertRaises(ValidationError) as context:
+            Base64ImageField().run_validation(data)
+        self.assertEqual(
+            context.exception.get_codes(), ['max_dimension']
+        )
+
+    def test_oversized_header(self):
+        self.assert_max_dimension(MAX_IMAGE_DIMENSION + 1, 1)
+
+    def test_decompression_bomb_header(self):
+        self.assert_max_dimension(BOMB_DIMENSION, BOMB_DIMENSION)
+
+
+class RecipeIngredientsUpdateTest(TestCase):
+    """Обновление рецепта приводит строки ингредиентов к переданным."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Автор', last_name='Рецептов', password='password'
+        )
+        cls.tag = Tag.objects.create(name='Тег', slug='tag')
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г'
+            )
+            for number in range(2)
+        ]
+        Recipe.objects.bulk_create([Recipe(
+            author=cls.author, name='Рецепт', text='Описание',
+            cooking_time=10, image='recipes/test.png'
+        )])
+        cls.recipe = Recipe.objects.get()
+        cls.recipe.tags.add(cls.tag)
+        first, second = cls.ingredients
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(
+                recipe=cls.recipe, ingredient=ingredient, amount=amount
+            )
+            for ingredient, amount in ((first, 1), (first, 2), (second, 3))
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def test_duplicate_rows_removed(self):
+        first, second = self.ingredients
+        response = self.client.patch(
+            f'{RECIPES_URL}{self.recipe.pk}/',
+            {
+                'tags': [self.tag.pk],
+                'ingredients': [
+                    {'id': first.pk, 'amount': 5},
+                    {'id': second.pk, 'amount': 3},
+                ],
+            },
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertCountEqual(
+            self.recipe.ingredients_in_recipes.values_list(
+                'ingredient', 'amount'
+            ),
+            [(first.pk, 5), (second.pk, 3)]
+        )
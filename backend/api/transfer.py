@@ -0,0 +1,340 @@
+import json
+import os
+import tarfile
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from glob import glob
+from multiprocessing import get_context
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.exceptions import SuspiciousFileOperation, ValidationError
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import Max, Prefetch
+from django.utils.dateparse import parse_datetime
+
+from recipes.counters import change_counter
+from recipes.importers import batched, read_ndjson
+from recipes.ingredient_index import ingredient_index
+from recipes.models import Ingredient, IngredientInRecipe, Recipe, Tag
+from recipes.search import update_search_vectors
+from recipes.short_links import short_link_index
+from .cache import bump_version
+from .constants import (
+    RECIPES_VERSION,
+    TRANSFER_CHUNK_NAME,
+    TRANSFER_IMAGE_QUEUE_SIZE,
+    TRANSFER_MEDIA_ARCHIVE,
+)
+from .feed import fan_out_recipes
+from .images import store_image
+
+User = get_user_model()
+
+RECIPE_IMAGE_DIRECTORY = Recipe._meta.get_field('image').upload_to
+
+
+def serialize_recipe(recipe):
+    return {
+        'author': recipe.author.username,
+        'name': recipe.name,
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+        'pub_date': recipe.pub_date.isoformat(),
+        'image': recipe.image.name,
+        'tags': [tag.slug for tag in recipe.tags.all()],
+        'ingredients': [
+            {
+                'name': item.ingredient.name,
+                'measurement_unit': item.ingredient.measurement_unit,
+                'amount': item.amount,
+            }
+            for item in recipe.ingredients_in_recipes.all()
+        ],
+    }
+
+
+def get_recipe_chunks(chunk_size):
+    """Рецепты пачками по chunk_size, перебор по ключу."""
+    recipes = Recipe.objects.select_related('author').prefetch_related(
+        Prefetch('tags', queryset=Tag.objects.only('slug')),
+        Prefetch(
+            'ingredients_in_recipes',
+            queryset=IngredientInRecipe.objects.select_related('ingredient')
+        ),
+    ).order_by('pk')
+    last_pk = 0
+    while True:
+        chunk = list(recipes.filter(pk__gt=last_pk)[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_pk = chunk[-1].pk
+
+
+def is_valid_ingredient(name, measurement_unit):
+    try:
+        Ingredient(
+            name=name, measurement_unit=measurement_unit
+        ).clean_fields()
+    except ValidationError:
+        return False
+    return True
+
+
+def add_image(archive, name):
+    info = tarfile.TarInfo(name)
+    info.size = default_storage.size(name)
+    with default_storage.open(name) as file:
+        archive.addfile(info, file)
+
+
+def export_recipes(directory, chunk_size, progress=None):
+    """
+    Выгружает рецепты в каталог: файлы NDJSON по chunk_size рецептов
+    и tar-архив изображений, каждое из которых попадает в архив один раз.
+    Возвращает число выгруженных рецептов.
+    """
+    os.makedirs(directory, exist_ok=True)
+    exported = 0
+    archived = set()
+    media_path = os.path.join(directory, TRANSFER_MEDIA_ARCHIVE)
+    with tarfile.open(media_path, 'w') as archive:
+        for number, chunk in enumerate(get_recipe_chunks(chunk_size)):
+            chunk_path = os.path.join(
+                directory, TRANSFER_CHUNK_NAME.format(number)
+            )
+            with open(chunk_path, 'w', encoding='utf-8') as file:
+                for recipe in chunk:
+                    file.write(json.dumps(
+                        serialize_recipe(recipe), ensure_ascii=False
+                    ) + '\n')
+                    name = recipe.image.name
+                    if name not in archived and default_storage.exists(name):
+                        add_image(archive, name)
+                        archived.add(name)
+            exported += len(chunk)
+            if progress:
+                progress(exported)
+    return exported
+
+
+class RecipeImporter:
+    """
+    Загружает рецепты, выгруженные export_recipes. Изображения
+    проверяются и сохраняются вместе с вариантами в пуле процессов,
+    рецепты вставляются пачками через bulk_create: ингредиенты пачки
+    находятся (и недостающие создаются) одним запросом, авторы — по
+    username. Счётчики, ленты, поисковые векторы и кэш, которые
+    bulk_create не обновляет через сигналы, пересчитываются для пачки.
+    Рецепты с неизвестным автором (если не задан default_author),
+    без изображения, без тегов или с тегами, которых нет в базе,
+    и с некорректными полями пропускаются.
+    """
+
+    def __init__(self, directory, batch_size, workers, default_author=None,
+                 progress=None):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.workers = workers
+        self.default_author_id = default_author and default_author.pk
+        self.progress = progress
+        self.imported = 0
+        self.errors = []
+        self.created_ingredients = 0
+
+    def run(self):
+        images = self.import_images()
+        tag_ids = dict(Tag.objects.values_list('slug', 'pk'))
+        for records in batched(self.read_records(), self.batch_size):
+            with transaction.atomic():
+                self.import_batch(records, images, tag_ids)
+            if self.progress:
+                self.progress(self.imported)
+        bump_version(RECIPES_VERSION)
+        short_link_index.invalidate()
+        if self.created_ingredients:
+            ingredient_index.invalidate()
+
+    def import_images(self):
+        """Имена изображений в архиве -> имена сохранённых файлов."""
+        path = os.path.join(self.directory, TRANSFER_MEDIA_ARCHIVE)
+        names = {}
+        if not os.path.exists(path):
+            return names
+        pool = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=get_context('spawn'),
+            initializer=django.setup
+        )
+        pending = {}
+        with pool, tarfile.open(path) as archive:
+            for member in archive:
+                if not member.isfile() or not member.name.startswith(
+                    RECIPE_IMAGE_DIRECTORY
+                ):
+                    continue
+                if len(pending) >= self.workers * TRANSFER_IMAGE_QUEUE_SIZE:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    self.collect_images(done, pending, names)
+                future = pool.submit(
+                    store_image, member.name,
+                    archive.extractfile(member).read()
+                )
+                pending[future] = member.name
+            self.collect_images(wait(pending).done, pending, names)
+        return names
+
+    def collect_images(self, futures, pending, names):
+        for future in futures:
+            name = pending.pop(future)
+            try:
+                names[name] = future.result()
+            except (OSError, ValueError, SyntaxError,
+                    SuspiciousFileOperation) as error:
+                self.errors.append(f'{name}: {error}')
+
+    def read_records(self):
+        paths = sorted(glob(os.path.join(self.directory, 'recipes-*.ndjson')))
+        for path in paths:
+            with open(path, encoding='utf-8') as file:
+                yield from read_ndjson(file, None)
+
+    def get_author_ids(self, records):
+        return dict(User.objects.filter(
+            username__in={record.get('author') for record in records}
+        ).values_list('username', 'pk'))
+
+    def get_ingredient_ids(self, records):
+        """(название, единица) -> id; недостающие ингредиенты создаются."""
+        keys = {
+            (item.get('name'), item.get('measurement_unit'))
+            for record in records
+            for item in record.get('ingredients', ())
+        }
+
+        def find(keys):
+            return {
+                (name, unit): pk
+                for name, unit, pk in Ingredient.objects.filter(
+                    name__in={name for name, _ in keys}
+                ).values_list('name', 'measurement_unit', 'pk')
+                if (name, unit) in keys
+            }
+
+        ingredient_ids = find(keys)
+        missing = {
+            key for key in keys - ingredient_ids.keys()
+            if is_valid_ingredient(*key)
+        }
+        if missing:
+            Ingredient.objects.bulk_create(
+                (Ingredient(name=name, measurement_unit=unit)
+                 for name, unit in missing),
+                ignore_conflicts=True
+            )
+            self.created_ingredients += len(missing)
+            ingredient_ids.update(find(missing))
+        return ingredient_ids
+
+    def get_image(self, name, images):
+        if name in images:
+            return images[name]
+        if name and default_storage.exists(name):
+            return name
+        return None
+
+    def build_recipe(self, record, author_ids, ingredient_ids, tag_ids,
+                     images):
+        """
+        Рецепт, его ингредиенты и id тегов по записи выгрузки.
+        ValueError или ValidationError, если запись нельзя загрузить.
+        """
+        author_id = author_ids.get(record['author'], self.default_author_id)
+        if author_id is None:
+            raise ValueError(f'неизвестный автор {record["author"]}')
+        image = self.get_image(record['image'], images)
+        if image is None:
+            raise ValueError(f'нет изображения {record["image"]}')
+        recipe = Recipe(
+            author_id=author_id, name=record['name'], text=record['text'],
+            cooking_time=record['cooking_time'], image=image
+        )
+        recipe.clean_fields(exclude=('author', 'image'))
+        if record.get('pub_date'):
+            recipe.pub_date = parse_datetime(record['pub_date'])
+            if recipe.pub_date is None:
+                raise ValueError(f'некорректная дата {record["pub_date"]}')
+        items = [
+            IngredientInRecipe(
+                recipe=recipe,
+                ingredient_id=ingredient_ids[
+                    (item['name'], item['measurement_unit'])
+                ],
+                amount=item['amount']
+            )
+            for item in record['ingredients']
+        ]
+        for item in items:
+            item.clean_fields(exclude=('recipe', 'ingredient'))
+        slugs = record.get('tags') or ()
+        unknown = [slug for slug in slugs if slug not in tag_ids]
+        if unknown:
+            raise ValueError(f'неизвестные теги {", ".join(unknown)}')
+        if not slugs:
+            raise ValueError('нет тегов')
+        return recipe, items, {tag_ids[slug] for slug in slugs}
+
+    def import_batch(self, records, images, tag_ids):
+        author_ids = self.get_author_ids(records)
+        ingredient_ids = self.get_ingredient_ids(records)
+        recipes, items, tags = [], [], []
+        for record in records:
+            try:
+                recipe, recipe_items, recipe_tags = self.build_recipe(
+                    record, author_ids, ingredient_ids, tag_ids, images
+                )
+            except (KeyError, TypeError, ValueError, ValidationError) as error:
+                self.errors.append(f'{record.get("name")}: {error}')
+                continue
+            recipes.append(recipe)
+            items.extend(recipe_items)
+            tags.extend((recipe, tag_id) for tag_id in recipe_tags)
+        if not recipes:
+            return
+        # bulk_create заменяет pub_date текущим временем (auto_now_add),
+        # поэтому даты из выгрузки записываются отдельным UPDATE.
+        pub_dates = [recipe.pub_date for recipe in recipes]
+        self.insert_recipes(recipes)
+        for recipe, pub_date in zip(recipes, pub_dates):
+            recipe.pub_date = pub_date or recipe.pub_date
+        Recipe.objects.bulk_update(recipes, ('pub_date',))
+        IngredientInRecipe.objects.bulk_create(items)
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag_id)
+            for recipe, tag_id in tags
+        )
+        for author_id, count in Counter(
+            recipe.author_id for recipe in recipes
+        ).items():
+            change_counter(User, author_id, 'recipes_count', count)
+        fan_out_recipes([
+            (recipe.pk, recipe.author_id, recipe.pub_date)
+            for recipe in recipes
+        ])
+        update_search_vectors(
+            Recipe.objects.filter(pk__in=[recipe.pk for recipe in recipes])
+        )
+        self.imported += len(recipes)
+
+    @staticmethod
+    def insert_recipes(recipes):
+        if connection.features.can_return_rows_from_bulk_insert:
+            Recipe.objects.bulk_create(recipes)
+            return
+        # Без RETURNING (SQLite) bulk_create не возвращает ключи,
+        # поэтому они назначаются заранее от текущего максимума.
+        last_pk = Recipe.objects.aggregate(last_pk=Max('pk'))['last_pk'] or 0
+        for pk, recipe in enumerate(recipes, last_pk + 1):
+            recipe.pk = pk
+        Recipe.objects.bulk_create(recipes)
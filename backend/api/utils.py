@@ -1,18 +1,229 @@
-def format_shopping_list(cart, recipes):
-    ingredients_info = [
-        '{}. {} - {} ({})'.format(
-            index,
-            ingredient['ingredient_name'].capitalize(),
-            ingredient['total_amount'],
-            ingredient['ingredient_unit']
+import csv
+import json
+import os
+from itertools import groupby
+from operator import itemgetter
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import CharField, F, IntegerField, Sum, Value, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework.renderers import BaseRenderer
+
+from recipes.models import IngredientInRecipe, Recipe
+from recipes.units import base_amount_expression, base_unit_expression
+from .constants import SHOPPING_LIST_CHUNK_SIZE, SHOPPING_LIST_PDF_SPOOL_SIZE
+
+INGREDIENTS_SECTION = 0
+RECIPES_SECTION = 1
+
+
+def limit_recipes_per_author(recipes, limit):
+    """
+    Оставляет в queryset не более limit последних рецептов каждого автора.
+    Отбор выполняется в одном запросе через оконную функцию ROW_NUMBER.
+    """
+    ranked = recipes.annotate(
+        author_rank=Window(
+            expression=RowNumber(),
+            partition_by=[F('author_id')],
+            order_by=[F('pub_date').desc(), F('id').desc()],
         )
-        for index, ingredient in enumerate(cart, start=1)
-    ]
-
-    shopping_list = '\n'.join([
-        'Список ингредиентов:',
-        *ingredients_info,
-        'Список рецептов:',
-        *[f'• {recipe}' for recipe in recipes]
-    ])
-    return shopping_list
+    ).values('pk', 'author_rank')
+    sql, params = ranked.query.sql_with_params()
+    return recipes.filter(pk__in=RawSQL(
+        f'SELECT ranked.id FROM ({sql}) ranked '
+        'WHERE ranked.author_rank <= %s',
+        (*params, limit)
+    ))
+
+
+def _get_shopping_list_rows(users):
+    """
+    Возвращает строки списков покупок пользователей одним запросом.
+    Каждая строка: (пользователь, раздел, название, единица, количество).
+    Количества переводятся в базовые единицы и суммируются в базе,
+    поэтому «мука, г» и «мука, кг» дают одну строку.
+    Строки читаются с сервера порциями, не загружаясь в память целиком.
+    """
+    unit = 'ingredient__measurement_unit'
+    ingredients = IngredientInRecipe.objects.filter(
+        recipe__shopping_carts__user__in=users
+    ).values(
+        owner=F('recipe__shopping_carts__user'),
+        section=Value(INGREDIENTS_SECTION, output_field=IntegerField()),
+        title=F('ingredient__name'),
+        unit=base_unit_expression(unit),
+    ).annotate(
+        total_amount=Sum(base_amount_expression('amount', unit)),
+    ).values_list(
+        'owner', 'section', 'title', 'unit', 'total_amount'
+    ).order_by()
+    recipes = Recipe.objects.filter(
+        shopping_carts__user__in=users
+    ).annotate(
+        owner=F('shopping_carts__user'),
+        section=Value(RECIPES_SECTION, output_field=IntegerField()),
+        title=F('name'),
+        unit=Value('', output_field=CharField()),
+        total_amount=Value(None, output_field=IntegerField()),
+    ).values_list(
+        'owner', 'section', 'title', 'unit', 'total_amount'
+    ).order_by()
+    return ingredients.union(recipes, all=True).order_by(
+        'owner', 'section', 'title'
+    ).iterator(chunk_size=SHOPPING_LIST_CHUNK_SIZE)
+
+
+def get_shopping_list_rows(user):
+    """
+    Строки списка покупок пользователя:
+    (раздел, название, единица измерения, количество).
+    Сначала идут суммы ингредиентов, затем названия рецептов.
+    """
+    return (row[1:] for row in _get_shopping_list_rows([user]))
+
+
+def get_shopping_lists_rows(users):
+    """
+    Списки покупок сразу для многих пользователей за один проход.
+    Возвращает пары (id пользователя, строки его списка).
+    """
+    for owner, rows in groupby(
+        _get_shopping_list_rows(users), key=itemgetter(0)
+    ):
+        yield owner, (row[1:] for row in rows)
+
+
+class ShoppingListExporter(BaseRenderer):
+    """
+    Базовый экспортёр списка покупок.
+    Как рендерер DRF отвечает за выбор формата по ?format=,
+    а сам файл отдаёт по частям через export().
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Используется только для ответов с ошибками."""
+        return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+    def export(self, rows):
+        raise NotImplementedError
+
+    @staticmethod
+    def lines(rows):
+        """Преобразует строки запроса в строки текстового списка."""
+        yield 'Список ингредиентов:'
+        section = INGREDIENTS_SECTION
+        for index, (row_section, name, unit, amount) in enumerate(
+            rows, start=1
+        ):
+            if row_section != section:
+                section = row_section
+                yield 'Список рецептов:'
+            if section == INGREDIENTS_SECTION:
+                yield f'{index}. {name.capitalize()} - {amount} ({unit})'
+            else:
+                yield f'• {name}'
+        if section == INGREDIENTS_SECTION:
+            yield 'Список рецептов:'
+
+
+class TxtShoppingListExporter(ShoppingListExporter):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def export(self, rows):
+        for line in self.lines(rows):
+            yield f'{line}\n'.encode(self.charset)
+
+
+class _Echo:
+    """Псевдобуфер для csv.writer, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+class CsvShoppingListExporter(ShoppingListExporter):
+    media_type = 'text/csv'
+    format = 'csv'
+    sections = {
+        INGREDIENTS_SECTION: 'Ингредиент',
+        RECIPES_SECTION: 'Рецепт',
+    }
+
+    def export(self, rows):
+        writer = csv.writer(_Echo())
+        yield writer.writerow(
+            ('Раздел', 'Название', 'Количество', 'Единица измерения')
+        ).encode(self.charset)
+        for section, name, unit, amount in rows:
+            yield writer.writerow(
+                (self.sections[section], name, amount, unit)
+            ).encode(self.charset)
+
+
+class PdfShoppingListExporter(ShoppingListExporter):
+    """
+    PDF нельзя отдавать до завершения вёрстки, поэтому документ
+    собирается во временном файле, который уходит на диск при
+    превышении SHOPPING_LIST_PDF_SPOOL_SIZE, и затем читается частями.
+    Без шрифта с кириллицей (SHOPPING_LIST_FONT_PATH) названия были бы
+    нечитаемы, поэтому export() сразу выбрасывает ImproperlyConfigured.
+    """
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    font_name = 'ShoppingListFont'
+    font_size = 12
+    margin = 50
+    line_height = 18
+    chunk_size = 64 * 1024
+
+    def get_font(self):
+        if self.font_name in pdfmetrics.getRegisteredFontNames():
+            return self.font_name
+        font_path = settings.SHOPPING_LIST_FONT_PATH
+        if not os.path.exists(font_path):
+            raise ImproperlyConfigured(
+                f'Шрифт для PDF-списка покупок не найден: {font_path}.'
+            )
+        pdfmetrics.registerFont(TTFont(self.font_name, font_path))
+        return self.font_name
+
+    def export(self, rows):
+        # Шрифт проверяется до начала ответа, а не в генераторе.
+        return self.render_pdf(rows, self.get_font())
+
+    def render_pdf(self, rows, font):
+        with SpooledTemporaryFile(
+            max_size=SHOPPING_LIST_PDF_SPOOL_SIZE
+        ) as buffer:
+            pdf = canvas.Canvas(buffer, pagesize=A4)
+            _, height = A4
+            y = height - self.margin
+            pdf.setFont(font, self.font_size)
+            for line in self.lines(rows):
+                if y < self.margin:
+                    pdf.showPage()
+                    pdf.setFont(font, self.font_size)
+                    y = height - self.margin
+                pdf.drawString(self.margin, y, line)
+                y -= self.line_height
+            pdf.save()
+            buffer.seek(0)
+            yield from iter(lambda: buffer.read(self.chunk_size), b'')
+
+
+SHOPPING_LIST_EXPORTERS = (
+    TxtShoppingListExporter,
+    CsvShoppingListExporter,
+    PdfShoppingListExporter,
+)
@@ -1,7 +1,10 @@
 from django.contrib.auth import get_user_model
-from django.db.models import F, Sum
+from django.db.models import (
+    BooleanField, Exists, OuterRef, Prefetch, Value,
+    prefetch_related_objects
+)
 from django_filters.rest_framework import DjangoFilterBackend
-from django.http import FileResponse
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
 from djoser.views import UserViewSet as DjoserUserViewSet
@@ -11,10 +14,18 @@ from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import (
     AllowAny, IsAuthenticated, IsAuthenticatedOrReadOnly
 )
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
+from .cache import (
+    CachedResponseMixin,
+    ConditionalGetMixin,
+    get_user_version_name,
+    get_version,
+)
 from .filters import IngredientFilter, RecipeFilter
-from .paginations import LimitPagination
+from .metrics import MetricsMixin
+from .paginations import FeedPagination, LimitOrKeysetPagination
 from .permissions import IsAuthorOrReadOnly
 from .serializers import (
     AvatarSerializer,
@@ -25,7 +36,18 @@ from .serializers import (
     UserDetailSerializer,
     UserWithRecipesSerializer
 )
-from .utils import format_shopping_list
+from .constants import (
+    RECIPES_VERSION, SHOPPING_LIST_FILENAME, TAGS_VERSION
+)
+from .utils import (
+    SHOPPING_LIST_EXPORTERS,
+    ShoppingListExporter,
+    TxtShoppingListExporter,
+    get_shopping_list_rows,
+    limit_recipes_per_author,
+)
+from recipes.ingredient_index import ingredient_index
+from recipes.short_links import short_link_index
 from recipes.models import (
     Favorite,
     Ingredient,
@@ -39,12 +61,12 @@ from users.models import Follow
 User = get_user_model()
 
 
-class UserViewSet(DjoserUserViewSet):
+class UserViewSet(MetricsMixin, DjoserUserViewSet):
     """Работа с пользователями."""
     queryset = User.objects.all()
     serializer_class = UserDetailSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
-    pagination_class = LimitPagination
+    pagination_class = LimitOrKeysetPagination
 
     @action(
         detail=False,
@@ -63,8 +85,6 @@ class UserViewSet(DjoserUserViewSet):
             serializer.is_valid(raise_exception=True)
             serializer.save()
             return Response(serializer.data, status=status.HTTP_200_OK)
-        if user.avatar:
-            user.avatar.delete()
         user.avatar = None
         user.save()
         return Response({'Аватар удален.'}, status=status.HTTP_204_NO_CONTENT)
@@ -76,7 +96,7 @@ class UserViewSet(DjoserUserViewSet):
     )
     def me(self, request):
         user = request.user
-        serializer = UserDetailSerializer(user)
+        serializer = self.track_serializer(UserDetailSerializer(user))
         return Response(serializer.data)
 
     @action(
@@ -85,23 +105,45 @@ class UserViewSet(DjoserUserViewSet):
         permission_classes=[IsAuthenticated]
     )
     def subscriptions(self, request):
-        queryset = User.objects.filter(
-            authors__user=request.user
-        ).prefetch_related('recipes')
-        page = self.paginate_queryset(queryset)
-        serializer = UserWithRecipesSerializer(
+        authors = self.annotate_subscriptions(
+            User.objects.filter(authors__user=request.user)
+        ).order_by('username')
+        page = self.paginate_queryset(authors)
+        self.prefetch_author_recipes(page)
+        serializer = self.track_serializer(UserWithRecipesSerializer(
             page,
             many=True,
             context={'request': request}
+        ))
+        return self.get_paginated_response(serializer.data)
+
+    @staticmethod
+    def annotate_subscriptions(authors):
+        """Добавляет признак подписки к авторам."""
+        return authors.annotate(
+            is_subscribed=Value(True, output_field=BooleanField()),
         )
-        user_data = serializer.data
 
-        for index, user in enumerate(user_data):
-            user_instance = User.objects.get(pk=user['id'])
-            user_data[index]['recipes'] = serializer.child.get_recipes(
-                user_instance
-            )
-        return self.get_paginated_response(user_data)
+    def prefetch_author_recipes(self, authors):
+        """
+        Загружает рецепты авторов одним запросом с учётом recipes_limit.
+        """
+        recipes = Recipe.objects.filter(author__in=authors)
+        recipes_limit = self.get_recipes_limit()
+        if recipes_limit is not None:
+            recipes = limit_recipes_per_author(recipes, recipes_limit)
+        prefetch_related_objects(
+            authors, Prefetch('recipes', queryset=recipes)
+        )
+
+    def get_recipes_limit(self):
+        recipes_limit = self.request.query_params.get('recipes_limit')
+        if recipes_limit is None:
+            return None
+        try:
+            return max(int(recipes_limit), 0)
+        except ValueError:
+            return None
 
     @action(
         detail=True,
@@ -122,27 +164,68 @@ class UserViewSet(DjoserUserViewSet):
                 raise ValidationError(
                     'Вы уже подписаны на этого пользователя.'
                 )
-            user_serializer = UserWithRecipesSerializer(
-                author,
-                context={'request': request}
+            author = self.annotate_subscriptions(
+                User.objects.filter(pk=author.pk)
+            ).get()
+            self.prefetch_author_recipes([author])
+            user_serializer = self.track_serializer(
+                UserWithRecipesSerializer(
+                    author,
+                    context={'request': request}
+                )
+            )
+            return Response(
+                user_serializer.data, status=status.HTTP_201_CREATED
             )
-            user_data = user_serializer.data
-            user_data['recipes'] = user_serializer.get_recipes(author)
-            return Response(user_data, status=status.HTTP_201_CREATED)
 
         follow = get_object_or_404(Follow, author=author, user=request.user)
         follow.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(
+    MetricsMixin, ConditionalGetMixin, viewsets.ReadOnlyModelViewSet
+):
     """ViewSet для работы с объектами модели Tag."""
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = [AllowAny]
 
+    def get_versions(self, request):
+        return [get_version(TAGS_VERSION)]
+
+
+class IngredientIndexMixin:
+    """
+    Поиск по префиксу (?name=) и получение ингредиента выполняются
+    в индексе в памяти, нечёткий поиск (?search=) — в базе.
+    """
+
+    def list(self, request, *args, **kwargs):
+        if 'search' in request.query_params:
+            return super().list(request, *args, **kwargs)
+        serializer = self.get_serializer(
+            ingredient_index.search(request.query_params.get('name', '')),
+            many=True
+        )
+        return Response(serializer.data)
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            ingredient = ingredient_index.get(int(kwargs['pk']))
+        except ValueError:
+            ingredient = None
+        if ingredient is None:
+            raise Http404
+        return Response(self.get_serializer(ingredient).data)
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+
+class IngredientViewSet(
+    MetricsMixin,
+    ConditionalGetMixin,
+    IngredientIndexMixin,
+    viewsets.ReadOnlyModelViewSet
+):
     """ViewSet для работы с объектами модели Ingredient."""
     serializer_class = IngredientSerializer
     permission_classes = [AllowAny]
@@ -150,15 +233,77 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
 
+    def get_versions(self, request):
+        return [ingredient_index.version]
+
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+    MetricsMixin,
+    ConditionalGetMixin,
+    CachedResponseMixin,
+    viewsets.ModelViewSet
+):
     """ViewSet для работы с объектами модели Recipe"""
     serializer_class = RecipeSerializer
     permission_classes = (IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly)
     queryset = Recipe.objects.all()
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
-    pagination_class = LimitPagination
+    pagination_class = LimitOrKeysetPagination
+
+    def get_versions(self, request):
+        versions = [get_version(RECIPES_VERSION)]
+        if request.user.is_authenticated:
+            versions.append(
+                get_version(get_user_version_name(request.user))
+            )
+        return versions
+
+    def get_queryset(self):
+        """
+        Загружает автора, теги и ингредиенты заранее, а флаги
+        избранного, корзины и подписки вычисляет в том же запросе.
+        Для полей, исключённых из ответа (?fields=, ?omit=, ?compact=1),
+        связи не загружаются, а описание не читается из базы.
+        """
+        fields = self.get_serializer().fields
+        recipes = Recipe.objects.prefetch_related(*(
+            lookup for name, lookup in (
+                ('tags', 'tags'),
+                ('ingredients', 'ingredients_in_recipes__ingredient'),
+            ) if name in fields
+        ))
+        if 'text' not in fields:
+            recipes = recipes.defer('text')
+        author = fields.get('author')
+        user = self.request.user
+        if not user.is_authenticated:
+            if author is not None:
+                recipes = recipes.select_related('author')
+            return recipes
+        if author is not None and 'is_subscribed' in author.fields:
+            recipes = recipes.prefetch_related(
+                Prefetch(
+                    'author',
+                    queryset=User.objects.annotate(
+                        is_subscribed=Exists(Follow.objects.filter(
+                            user=user, author=OuterRef('pk')
+                        ))
+                    )
+                )
+            )
+        elif author is not None:
+            recipes = recipes.select_related('author')
+        # Флаги нужны и фильтрам ?is_favorited= и ?is_in_shopping_cart=.
+        return recipes.annotate(**{
+            name: Exists(model.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            ))
+            for name, model in (
+                ('is_favorited', Favorite),
+                ('is_in_shopping_cart', ShoppingCart),
+            ) if name in fields or self.request.query_params.get(name)
+        })
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
@@ -204,10 +349,21 @@ class RecipeViewSet(viewsets.ModelViewSet):
         recipe = self.get_object()
         return self.handle_cart_or_favorite(request, ShoppingCart, recipe)
 
+    @action(
+        detail=False,
+        permission_classes=[IsAuthenticated],
+        pagination_class=FeedPagination
+    )
+    def feed(self, request):
+        """Рецепты авторов из подписок пользователя, новые первыми."""
+        page = self.paginate_queryset(self.get_queryset())
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
     @action(detail=True, methods=['GET'], url_path='get-link')
     def get_link(self, request, pk):
-        """Получаем короткую ссылку."""
-        if not Recipe.objects.filter(id=pk).exists():
+        """Получаем короткую ссылку с кодом рецепта."""
+        if not pk.isdigit() or int(pk) not in short_link_index:
             raise ValidationError(f"Рецепт с id {pk} не найден.")
 
         short_link = request.build_absolute_uri(
@@ -222,31 +378,22 @@ class RecipeViewSet(viewsets.ModelViewSet):
         detail=False,
         methods=['get'],
         url_path='download_shopping_cart',
-        permission_classes=[IsAuthenticated]
+        permission_classes=[IsAuthenticated],
+        renderer_classes=SHOPPING_LIST_EXPORTERS + (JSONRenderer,)
     )
     def download_shopping_cart(self, request):
-        cart = ShoppingCart.objects.filter(user=request.user).prefetch_related(
-            'recipe__ingredients_in_recipes'
-        ).annotate(
-            ingredient_name=F(
-                'recipe__ingredients_in_recipes__ingredient__name'
-            ),
-            ingredient_unit=F(
-                'recipe__ingredients_in_recipes__ingredient__measurement_unit'
-            ),
-            amount=F('recipe__ingredients_in_recipes__amount'),
-        ).values(
-            'ingredient_name',
-            'ingredient_unit'
-        ).annotate(total_amount=Sum('amount')).order_by('ingredient_name')
-        recipes = Recipe.objects.filter(
-            shopping_carts__user=request.user
-        ).distinct()
-        shopping_list = format_shopping_list(cart, recipes)
-        response = FileResponse(
-            shopping_list,
-            as_attachment=True,
-            filename='shopping_cart.txt'
+        exporter = request.accepted_renderer
+        if not isinstance(exporter, ShoppingListExporter):
+            exporter = TxtShoppingListExporter()
+        content_type = exporter.media_type
+        if exporter.charset:
+            content_type = f'{content_type}; charset={exporter.charset}'
+        response = StreamingHttpResponse(
+            exporter.export(get_shopping_list_rows(request.user)),
+            content_type=content_type
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="{SHOPPING_LIST_FILENAME}.'
+            f'{exporter.format}"'
         )
-
         return response
@@ -0,0 +1,8 @@
+from django.conf import settings
+
+from api.async_views import with_async_views
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = with_async_views(
+    sync_urlpatterns, settings.ASYNC_VIEW_ROUTES
+)
@@ -20,6 +20,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'djoser',
@@ -30,6 +31,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -39,7 +41,9 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'foodgram.urls'
+# Под ASGI (foodgram/asgi.py) — foodgram.asgi_urls с асинхронными
+# вариантами маршрутов ASYNC_VIEW_ROUTES.
+ROOT_URLCONF = os.getenv('ROOT_URLCONF', 'foodgram.urls')
 
 TEMPLATES = [
     {
@@ -70,6 +74,19 @@ DATABASES = {
     }
 }
 
+# Версии ресурсов для кэша ответов, ETag и индексов в памяти хранятся
+# в кэше. LocMemCache подходит только для одного процесса: изменения
+# из других воркеров и команд manage.py до него не доходят. Образ
+# и docker compose задают общий memcached.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -102,6 +119,7 @@ STATIC_ROOT = 'backend_static/static/'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media/')
+DEFAULT_FILE_STORAGE = 'api.storage.ContentAddressedStorage'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -121,3 +139,40 @@ DJOSER = {
         'user_list': ('rest_framework.permissions.AllowAny',),
     },
 }
+
+SHOPPING_LIST_FONT_PATH = os.getenv(
+    'SHOPPING_LIST_FONT_PATH',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
+BACKGROUND_WORKERS = int(os.getenv('BACKGROUND_WORKERS', 2))
+
+# Бюджеты SQL-запросов GET по именам маршрутов; при превышении пишется
+# предупреждение, а с QUERY_BUDGET_STRICT (в тестах) — исключение.
+QUERY_BUDGETS = {
+    'api:recipe-list': 8,
+    'api:recipe-detail': 8,
+    'api:recipe-feed': 9,
+    'api:recipe-download-shopping-cart': 3,
+    'api:users-list': 4,
+    'api:users-subscriptions': 5,
+    'api:tags-list': 2,
+    'api:ingredients-list': 2,
+    'api:ingredients-detail': 2,
+    'api:recipe-get-link': 2,
+    'redirect_short_link': 1,
+}
+QUERY_BUDGET_STRICT = os.getenv('QUERY_BUDGET_STRICT', 'False') == 'True'
+
+# Маршруты чтения, которые под ASGI обслуживаются асинхронно: работа
+# с базой выполняется в пуле из ASYNC_DB_THREADS потоков на процесс.
+ASYNC_VIEW_ROUTES = (
+    'api:recipe-list',
+    'api:recipe-detail',
+    'api:ingredients-list',
+    'api:ingredients-detail',
+    'api:tags-list',
+    'api:tags-detail',
+    'redirect_short_link',
+)
+ASYNC_DB_THREADS = int(os.getenv('ASYNC_DB_THREADS', 8))
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.models import Group
+from django.db.models import Count, Prefetch
 from django.utils.html import mark_safe
 
 from .models import (
@@ -9,7 +10,6 @@ from .models import (
     Recipe,
     ShoppingCart,
     Tag,
-    IngredientInRecipe,
 )
 
 admin.site.unregister(Group)
@@ -21,6 +21,10 @@ class IngredientInRecipeInline(admin.TabularInline):
     extra = 0
     fields = ('ingredient', 'amount', 'measurement_unit_display')
     readonly_fields = ('measurement_unit_display',)
+    autocomplete_fields = ('ingredient',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('ingredient')
 
     @admin.display(description='Единица измерения')
     def measurement_unit_display(self, ingredient_in_recipe):
@@ -39,6 +43,19 @@ class RecipeAdmin(admin.ModelAdmin):
     list_filter = ('author', 'tags')
     inlines = [IngredientInRecipeInline]
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            'author'
+        ).prefetch_related(
+            'tags',
+            Prefetch(
+                'ingredients_in_recipes',
+                queryset=IngredientInRecipe.objects.select_related(
+                    'ingredient'
+                )
+            )
+        )
+
     @admin.display(description='Изображение')
     @mark_safe
     def show_image(self, recipe):
@@ -49,10 +66,6 @@ class RecipeAdmin(admin.ModelAdmin):
             )
         return 'Нет изображения'
 
-    @admin.display(description='Избранное')
-    def favorites_count(self, recipe):
-        return recipe.favorites.count()
-
     @admin.display(description='Теги')
     @mark_safe
     def tags_list(self, recipe):
@@ -79,15 +92,23 @@ class TagAdmin(admin.ModelAdmin):
     list_display_links = ('name',)
     search_fields = ('name',)
 
-    @admin.display(description='Рецепты')
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            recipes_total=Count('recipes')
+        )
+
+    @admin.display(description='Рецепты', ordering='recipes_total')
     def recipe_count(self, tag):
-        return tag.recipes.count()
+        return tag.recipes_total
 
 
 @admin.register(Favorite)
 class FavoriteAdmin(admin.ModelAdmin):
     list_display = ('user', 'recipe')
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user', 'recipe')
+
 
 @admin.register(Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
@@ -95,11 +116,19 @@ class IngredientAdmin(admin.ModelAdmin):
     list_filter = ('measurement_unit',)
     search_fields = ('name', 'measurement_unit',)
 
-    @admin.display(description='Рецепты')
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            recipes_total=Count('ingredients_in_recipes')
+        )
+
+    @admin.display(description='Рецепты', ordering='recipes_total')
     def recipes_count(self, ingredient):
-        return ingredient.recipes.count()
+        return ingredient.recipes_total
 
 
 @admin.register(ShoppingCart)
 class ShoppingListAdmin(admin.ModelAdmin):
     list_display = ('user', 'recipe')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user', 'recipe')
@@ -1,2 +1,26 @@
 MIN_AMOUNT = 1
 MIN_COOKING_TIME = 1
+TRIGRAM_SIMILARITY_THRESHOLD = 0.3
+# Единица измерения ингредиента -> (базовая единица, множитель).
+# Единицы, которых нет в таблице, считаются базовыми.
+UNIT_CONVERSIONS = {
+    'г': ('г', 1),
+    'гр': ('г', 1),
+    'гр.': ('г', 1),
+    'кг': ('г', 1000),
+    'кг.': ('г', 1000),
+    'мл': ('мл', 1),
+    'л': ('мл', 1000),
+    'л.': ('мл', 1000),
+}
+SEARCH_CONFIG = 'russian'
+# Короткий код рецепта: буква и пять символов base62. Id переставляется
+# умножением на SHORT_LINK_MULTIPLIER (взаимно простой с числом кодов),
+# поэтому коды соседних рецептов не идут подряд.
+SHORT_LINK_TAIL_LENGTH = 5
+SHORT_LINK_MULTIPLIER = 2654435761
+# Изменения битовой карты коротких ссылок хранятся в кэше
+# SHORT_LINK_CHANGES_TIMEOUT секунд; воркер, отставший больше чем
+# на SHORT_LINK_CHANGES_LIMIT изменений, перестраивает карту по базе.
+SHORT_LINK_CHANGES_TIMEOUT = 24 * 60 * 60
+SHORT_LINK_CHANGES_LIMIT = 1000
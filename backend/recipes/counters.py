@@ -0,0 +1,56 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from users.models import Follow
+from .models import Favorite, Recipe
+
+User = get_user_model()
+
+# Модель со счётчиком, поле счётчика -> модель и поле подсчитываемых строк.
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'subscriptions_count', Follow, 'user'),
+    (User, 'followers_count', Follow, 'author'),
+)
+
+
+def change_counter(model, pk, field, delta):
+    """Атомарно меняет счётчик в базе, не опуская его ниже нуля."""
+    model.objects.filter(pk=pk).update(
+        **{field: Greatest(F(field) + delta, 0)}
+    )
+
+
+def change_counters(instance, delta):
+    """Меняет счётчики, которые учитывают строку instance."""
+    for model, field, counted_model, lookup in COUNTERS:
+        if isinstance(instance, counted_model):
+            change_counter(
+                model, getattr(instance, f'{lookup}_id'), field, delta
+            )
+
+
+def recount_counters():
+    """
+    Пересчитывает все счётчики одним UPDATE на каждый и обновляет
+    только расходящиеся строки. Возвращает число исправленных строк.
+    """
+    repaired = {}
+    for model, field, counted_model, lookup in COUNTERS:
+        actual = Coalesce(
+            Subquery(
+                counted_model.objects.filter(**{lookup: OuterRef('pk')})
+                .order_by().values(lookup).annotate(count=Count('pk'))
+                .values('count'),
+                output_field=IntegerField()
+            ),
+            0
+        )
+        repaired[f'{model._meta.model_name}.{field}'] = (
+            model.objects.annotate(actual=actual)
+            .exclude(**{field: F('actual')})
+            .update(**{field: actual})
+        )
+    return repaired
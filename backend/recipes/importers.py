@@ -0,0 +1,359 @@
+import csv
+import io
+import json
+import os
+import re
+from collections import namedtuple
+from functools import partial
+from itertools import islice
+
+from django.db import connection, transaction
+
+JSON_CHUNK_SIZE = 64 * 1024
+DIFF_SAMPLE_SIZE = 10
+JSON_SEPARATORS_RE = re.compile(r'[\s,]*')
+
+ImportResult = namedtuple(
+    'ImportResult', ('read', 'inserted', 'updated', 'new', 'changed')
+)
+# Значение уникального поля field уже занято строкой с другим ключом.
+ImportConflict = namedtuple(
+    'ImportConflict', ('field', 'value', 'key', 'other_key')
+)
+
+
+class ImportConflictError(ValueError):
+    """
+    Значения уникальных полей (кроме ключа) совпадают у строк с разными
+    ключами: в файле или с уже сохранёнными строками.
+    """
+
+    def __init__(self, count, conflicts):
+        super().__init__(count, conflicts)
+        self.count = count
+        self.conflicts = conflicts
+
+
+def read_csv(file, fields):
+    for row in csv.reader(file):
+        if row:
+            yield dict(zip(fields, (value.strip() for value in row)))
+
+
+def read_ndjson(file, fields):
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_json(file, fields):
+    """
+    Читает JSON-массив объектов по частям, не загружая файл целиком:
+    объекты разбираются raw_decode по мере поступления данных.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    opened = False
+    for chunk in iter(partial(file.read, JSON_CHUNK_SIZE), ''):
+        buffer += chunk
+        position = JSON_SEPARATORS_RE.match(buffer).end()
+        if not opened:
+            if position == len(buffer):
+                continue
+            if buffer[position] != '[':
+                raise ValueError('Ожидался JSON-массив объектов.')
+            opened = True
+            position += 1
+        while True:
+            position = JSON_SEPARATORS_RE.match(buffer, position).end()
+            if position == len(buffer) or buffer[position] == ']':
+                break
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break
+            yield item
+        buffer = buffer[position:]
+    if buffer.strip() not in ('', ']'):
+        raise ValueError('Некорректный JSON в конце файла.')
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+    'ndjson': read_ndjson,
+}
+
+
+def get_format(path):
+    extension = os.path.splitext(path)[1].lstrip('.').lower()
+    return 'ndjson' if extension == 'jsonl' else extension
+
+
+def read_rows(file, fields, file_format):
+    """Строки файла как словари, только с полями fields."""
+    for row in READERS[file_format](file, fields):
+        yield {field: row.get(field, '') for field in fields}
+
+
+def batched(rows, batch_size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+class CatalogImporter:
+    """
+    Загрузка справочника со слиянием по ключу conflict_fields: новые строки
+    добавляются, у существующих обновляются update_fields (если заданы).
+    В PostgreSQL строки пачками загружаются COPY во временную таблицу,
+    а затем сливаются одним INSERT ... ON CONFLICT. На других СУБД
+    используется bulk_create(ignore_conflicts=True) и bulk_update.
+    В режиме dry_run изменения откатываются, а результат содержит
+    примеры новых и изменённых строк. Если значение другого уникального
+    поля (например, названия тега) занято строкой с другим ключом,
+    загрузка прерывается с ImportConflictError до записи.
+    """
+
+    def __init__(self, model, fields, conflict_fields, update_fields=()):
+        self.model = model
+        self.fields = tuple(fields)
+        self.conflict_fields = tuple(conflict_fields)
+        self.update_fields = tuple(update_fields)
+        self.unique_fields = tuple(
+            name for name in self.fields
+            if name not in self.conflict_fields
+            and model._meta.get_field(name).unique
+        )
+
+    def run(self, rows, batch_size, dry_run=False, progress=None):
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                result = self.run_postgresql(rows, batch_size, progress)
+            else:
+                result = self.run_generic(rows, batch_size, progress)
+            if dry_run:
+                transaction.set_rollback(True)
+        return result
+
+    def columns(self, fields):
+        return [
+            connection.ops.quote_name(self.model._meta.get_field(name).column)
+            for name in fields
+        ]
+
+    def run_postgresql(self, rows, batch_size, progress):
+        meta = self.model._meta
+        table = connection.ops.quote_name(meta.db_table)
+        staging = connection.ops.quote_name(f'{meta.db_table}_import')
+        columns = ', '.join(self.columns(self.fields))
+        keys = ', '.join(self.columns(self.conflict_fields))
+        key_match = ' AND '.join(
+            f't.{column} = s.{column}'
+            for column in self.columns(self.conflict_fields)
+        )
+        definitions = ', '.join(
+            f'{column} {meta.get_field(name).db_type(connection)}'
+            for name, column in zip(self.fields, self.columns(self.fields))
+        )
+        # Из повторов ключа во входных данных остаётся последняя строка.
+        unique_rows = (
+            f'SELECT DISTINCT ON ({keys}) {columns} FROM {staging} '
+            f'ORDER BY {keys}, position DESC'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMP TABLE {staging} ({definitions}, '
+                'position bigserial) ON COMMIT DROP'
+            )
+            read = 0
+            for batch in batched(rows, batch_size):
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(
+                    [row[field] for field in self.fields] for row in batch
+                )
+                buffer.seek(0)
+                cursor.copy_expert(
+                    f'COPY {staging} ({columns}) FROM STDIN WITH (FORMAT csv)',
+                    buffer
+                )
+                read += len(batch)
+                if progress:
+                    progress(read)
+            self.check_conflicts_postgresql(cursor, table, unique_rows)
+            new = self.fetch_diff(
+                cursor,
+                f'SELECT {columns} FROM ({unique_rows}) s WHERE NOT EXISTS '
+                f'(SELECT 1 FROM {table} t WHERE {key_match})'
+            )
+            changed = (0, [])
+            conflict = 'ON CONFLICT DO NOTHING'
+            if self.update_fields:
+                updates = self.columns(self.update_fields)
+                differs = ' OR '.join(
+                    f't.{column} IS DISTINCT FROM s.{column}'
+                    for column in updates
+                )
+                changed = self.fetch_diff(
+                    cursor,
+                    f'SELECT s.* FROM ({unique_rows}) s '
+                    f'JOIN {table} t ON {key_match} WHERE {differs}'
+                )
+                conflict = (
+                    f'ON CONFLICT ({keys}) DO UPDATE SET '
+                    + ', '.join(
+                        f'{column} = EXCLUDED.{column}' for column in updates
+                    )
+                    + ' WHERE ' + ' OR '.join(
+                        f't.{column} IS DISTINCT FROM EXCLUDED.{column}'
+                        for column in updates
+                    )
+                )
+            cursor.execute(
+                f'WITH merged AS (INSERT INTO {table} AS t ({columns}) '
+                f'{unique_rows} {conflict} RETURNING (xmax = 0) AS inserted) '
+                'SELECT COUNT(*) FILTER (WHERE inserted), '
+                'COUNT(*) FILTER (WHERE NOT inserted) FROM merged'
+            )
+            inserted, updated = cursor.fetchone()
+        return ImportResult(read, inserted, updated, new, changed)
+
+    def check_conflicts_postgresql(self, cursor, table, unique_rows):
+        """Ищет занятые значения уникальных полей в файле и в таблице."""
+        keys = self.columns(self.conflict_fields)
+        key_match = ' AND '.join(f'o.{key} = s.{key}' for key in keys)
+        count, conflicts = 0, []
+        for name, column in zip(
+            self.unique_fields, self.columns(self.unique_fields)
+        ):
+            source_keys = ', '.join(f's.{key}' for key in keys)
+            other_keys = ', '.join(f'o.{key}' for key in keys)
+            field_count, rows = self.fetch_diff(
+                cursor,
+                f'SELECT s.{column}, {source_keys}, {other_keys} '
+                f'FROM ({unique_rows}) s JOIN {table} o '
+                f'ON o.{column} = s.{column} WHERE NOT ({key_match}) '
+                f'UNION ALL SELECT s.{column}, {source_keys}, {other_keys} '
+                f'FROM ({unique_rows}) s JOIN ({unique_rows}) o '
+                f'ON o.{column} = s.{column} '
+                f'AND ({source_keys}) < ({other_keys})'
+            )
+            count += field_count
+            conflicts.extend(
+                ImportConflict(
+                    name, row[0], row[1:len(keys) + 1], row[len(keys) + 1:]
+                )
+                for row in rows
+            )
+        if count:
+            raise ImportConflictError(count, conflicts[:DIFF_SAMPLE_SIZE])
+
+    @staticmethod
+    def fetch_diff(cursor, query):
+        """Число строк запроса и первые DIFF_SAMPLE_SIZE из них."""
+        cursor.execute(f'SELECT COUNT(*) FROM ({query}) diff')
+        count = cursor.fetchone()[0]
+        cursor.execute(f'{query} LIMIT {DIFF_SAMPLE_SIZE}')
+        return count, cursor.fetchall()
+
+    def get_key(self, row):
+        if isinstance(row, dict):
+            return tuple(row[field] for field in self.conflict_fields)
+        return tuple(getattr(row, field) for field in self.conflict_fields)
+
+    def find(self, keys):
+        """Сохранённые строки с ключами keys: ключ -> объект."""
+        keys = set(keys)
+        key_field = self.conflict_fields[0]
+        return {
+            self.get_key(instance): instance
+            for instance in self.model.objects.filter(**{
+                f'{key_field}__in': {key[0] for key in keys}
+            })
+            if self.get_key(instance) in keys
+        }
+
+    def check_conflicts(self, unique):
+        """Ищет занятые значения уникальных полей в пачке и в таблице."""
+        conflicts = []
+        for field in self.unique_fields:
+            keys_by_value = {}
+            for key, row in unique.items():
+                keys_by_value.setdefault(row[field], []).append(key)
+            for value, keys in keys_by_value.items():
+                conflicts.extend(
+                    ImportConflict(field, value, key, other_key)
+                    for key, other_key in zip(keys, keys[1:])
+                )
+            for instance in self.model.objects.filter(
+                **{f'{field}__in': keys_by_value}
+            ):
+                other_key = self.get_key(instance)
+                conflicts.extend(
+                    ImportConflict(field, getattr(instance, field), key,
+                                   other_key)
+                    for key in keys_by_value[getattr(instance, field)]
+                    if key != other_key
+                )
+        if conflicts:
+            raise ImportConflictError(
+                len(conflicts), conflicts[:DIFF_SAMPLE_SIZE]
+            )
+
+    def run_generic(self, rows, batch_size, progress):
+        read = inserted = updated = 0
+        new_sample, changed_sample = [], []
+        for batch in batched(rows, batch_size):
+            unique = {self.get_key(row): row for row in batch}
+            self.check_conflicts(unique)
+            existing = self.find(unique)
+            created = [
+                self.model(**row) for key, row in unique.items()
+                if key not in existing
+            ]
+            changed = []
+            for key, row in unique.items():
+                instance = existing.get(key)
+                if instance is None or all(
+                    getattr(instance, field) == row[field]
+                    for field in self.update_fields
+                ):
+                    continue
+                for field in self.update_fields:
+                    setattr(instance, field, row[field])
+                changed.append(instance)
+            self.model.objects.bulk_create(created, ignore_conflicts=True)
+            if created:
+                # ignore_conflicts молча пропускает строки, поэтому
+                # добавленными считаются только найденные после вставки.
+                written = self.find(
+                    [self.get_key(instance) for instance in created]
+                )
+                created = [
+                    instance for instance in created
+                    if self.get_key(instance) in written
+                ]
+            if changed:
+                self.model.objects.bulk_update(changed, self.update_fields)
+            new_sample.extend(
+                tuple(getattr(instance, field) for field in self.fields)
+                for instance in created[:DIFF_SAMPLE_SIZE - len(new_sample)]
+            )
+            changed_sample.extend(
+                tuple(getattr(instance, field) for field in self.fields)
+                for instance in changed[
+                    :DIFF_SAMPLE_SIZE - len(changed_sample)
+                ]
+            )
+            read += len(batch)
+            inserted += len(created)
+            updated += len(changed)
+            if progress:
+                progress(read)
+        return ImportResult(
+            read, inserted, updated,
+            (inserted, new_sample), (updated, changed_sample)
+        )
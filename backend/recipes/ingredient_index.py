@@ -0,0 +1,115 @@
+import re
+import time
+from bisect import bisect_left, bisect_right
+from threading import Lock
+
+from django.core.cache import cache
+
+from .constants import TRIGRAM_SIMILARITY_THRESHOLD
+from .models import Ingredient
+
+INDEX_VERSION_KEY = 'ingredient_index_version'
+MAX_CHAR = chr(0x10FFFF)
+WORD_PATTERN = re.compile(r'\w+')
+
+
+def trigrams(text):
+    """Множество триграмм строки по правилам pg_trgm."""
+    return {
+        padded[index:index + 3]
+        for word in WORD_PATTERN.findall(text.casefold())
+        for padded in (f'  {word} ',)
+        for index in range(len(padded) - 2)
+    }
+
+
+def trigram_similarity(first, second):
+    if not first or not second:
+        return 0
+    return len(first & second) / len(first | second)
+
+
+class IngredientIndex:
+    """
+    Индекс ингредиентов в памяти процесса для автодополнения.
+    Хранит ингредиенты в массиве, отсортированном по casefold-названию,
+    и ищет по префиксу двоичным поиском без обращения к базе.
+    Строится лениво при первом запросе. Версия индекса — время последнего
+    изменения в наносекундах — хранится в кэше, поэтому при общем бэкенде
+    кэша изменение в одном процессе перестраивает индекс во всех воркерах.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._version = None
+        self._state = ([], [], {}, [])
+
+    @property
+    def version(self):
+        return cache.get_or_set(INDEX_VERSION_KEY, time.time_ns, None)
+
+    def invalidate(self):
+        cache.set(INDEX_VERSION_KEY, time.time_ns(), None)
+
+    def search(self, prefix=''):
+        keys, ingredients, _, _ = self._load()
+        if not prefix:
+            return ingredients
+        prefix = prefix.casefold()
+        return ingredients[
+            bisect_left(keys, prefix):bisect_right(keys, prefix + MAX_CHAR)
+        ]
+
+    def get(self, pk):
+        _, _, by_id, _ = self._load()
+        return by_id.get(pk)
+
+    def rank(self, query, threshold=TRIGRAM_SIMILARITY_THRESHOLD):
+        """
+        Нечёткий поиск, возвращает id ингредиентов: сначала совпадения
+        по префиксу, затем по подстроке, затем по сходству триграмм
+        не ниже threshold.
+        """
+        keys, ingredients, _, ingredient_trigrams = self._load()
+        query_key = query.casefold()
+        query_trigrams = trigrams(query)
+        matches = []
+        for key, ingredient, name_trigrams in zip(
+            keys, ingredients, ingredient_trigrams
+        ):
+            similarity = trigram_similarity(query_trigrams, name_trigrams)
+            if key.startswith(query_key):
+                match_rank = 0
+            elif query_key in key:
+                match_rank = 1
+            elif similarity >= threshold:
+                match_rank = 2
+            else:
+                continue
+            matches.append((match_rank, -similarity, key, ingredient.pk))
+        matches.sort()
+        return [match[-1] for match in matches]
+
+    def _load(self):
+        version = self.version
+        if self._version != version:
+            with self._lock:
+                if self._version != version:
+                    self._build(version)
+        return self._state
+
+    def _build(self, version):
+        ingredients = sorted(
+            Ingredient.objects.all(),
+            key=lambda ingredient: (ingredient.name.casefold(), ingredient.pk)
+        )
+        self._state = (
+            [ingredient.name.casefold() for ingredient in ingredients],
+            ingredients,
+            {ingredient.pk: ingredient for ingredient in ingredients},
+            [trigrams(ingredient.name) for ingredient in ingredients],
+        )
+        self._version = version
+
+
+ingredient_index = IngredientIndex()
@@ -1,12 +1,6 @@
-from .data_import_base import BaseImportCommand
-from recipes.models import Ingredient
+from .import_ingredients import Command as ImportIngredientsCommand
 
 
-class Command(BaseImportCommand):
+class Command(ImportIngredientsCommand):
     help = 'Import ingredients from JSON file'
-
-    def handle(self, *args, **kwargs):
-        created_count = self.import_data(Ingredient, 'ingredients.json')
-        self.stdout.write(self.style.SUCCESS(
-            f'Ингредиенты успешно импортированы: {created_count}'
-        ))
+    file_name = 'ingredients.json'
@@ -1,12 +1,6 @@
-from .data_import_base import BaseImportCommand
-from recipes.models import Tag
+from .import_tags import Command as ImportTagsCommand
 
 
-class Command(BaseImportCommand):
+class Command(ImportTagsCommand):
     help = 'Import tags from JSON file'
-
-    def handle(self, *args, **kwargs):
-        created_count = self.import_data(Tag, 'tags.json')
-        self.stdout.write(self.style.SUCCESS(
-            f'Теги успешно импортированы: {created_count}'
-        ))
+    file_name = 'tags.json'
@@ -1,23 +1,98 @@
-import csv
 import os
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.importers import (
+    READERS,
+    CatalogImporter,
+    ImportConflictError,
+    get_format,
+    read_rows,
+)
+
+IMPORT_BATCH_SIZE = 10000
 
 
 class BaseImportCommand(BaseCommand):
-    help = 'Import data from CSV file'
-
-    def import_data(self, model_class, csv_file_name, fields):
-        csv_file_path = os.path.join('data', csv_file_name)
-
-        with open(csv_file_path, mode='r', encoding='utf-8') as file:
-            reader = csv.reader(file)
-            objects = []
-            for row in reader:
-                obj_data = {field: row[i].strip() for i, field in enumerate(
-                    fields
-                )}
-                objects.append(model_class(**obj_data))
-            model_class.objects.bulk_create(objects, ignore_conflicts=True)
-
-        return len(objects)
+    help = 'Import catalog data from CSV, JSON or NDJSON file'
+    model = None
+    fields = ()
+    conflict_fields = ()
+    update_fields = ()
+    file_name = None
+    success_message = 'Данные успешно импортированы'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?',
+            help=f'Path to the file, data/{self.file_name} by default'
+        )
+        parser.add_argument(
+            '--format', choices=sorted(READERS),
+            help='File format, detected by extension by default'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=IMPORT_BATCH_SIZE
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Show the changes without saving them'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path'] or os.path.join('data', self.file_name)
+        file_format = options['format'] or get_format(path)
+        if file_format not in READERS:
+            raise CommandError(f'Неизвестный формат файла: {path}')
+        importer = CatalogImporter(
+            self.model, self.fields, self.conflict_fields, self.update_fields
+        )
+        with open(path, mode='r', encoding='utf-8') as file:
+            try:
+                result = importer.run(
+                    read_rows(file, self.fields, file_format),
+                    options['batch_size'],
+                    dry_run=options['dry_run'],
+                    progress=lambda read: self.stderr.write(
+                        f'Прочитано строк: {read}'
+                    )
+                )
+            except ImportConflictError as error:
+                raise CommandError(self.format_conflicts(error))
+        if options['dry_run']:
+            self.write_diff('Новые', result.new)
+            self.write_diff('Изменённые', result.changed)
+            return
+        self.after_import()
+        self.stdout.write(self.style.SUCCESS(
+            f'{self.success_message}: добавлено {result.inserted}, '
+            f'обновлено {result.updated}, прочитано {result.read}'
+        ))
+
+    def write_diff(self, title, diff):
+        count, sample = diff
+        self.stdout.write(f'{title}: {count}')
+        for row in sample:
+            self.stdout.write('  ' + ', '.join(map(str, row)))
+
+    def format_key(self, key):
+        return ', '.join(
+            f'{field}={value}'
+            for field, value in zip(self.conflict_fields, key)
+        )
+
+    def format_conflicts(self, error):
+        lines = [
+            'Загрузка отменена, значения уникальных полей уже заняты '
+            f'другими строками: {error.count}'
+        ]
+        lines.extend(
+            f'  {conflict.field}={conflict.value}: '
+            f'{self.format_key(conflict.key)} и '
+            f'{self.format_key(conflict.other_key)}'
+            for conflict in error.conflicts
+        )
+        return '\n'.join(lines)
+
+    def after_import(self):
+        pass
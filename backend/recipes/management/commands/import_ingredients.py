@@ -1,14 +1,15 @@
 from .import_base import BaseImportCommand
+from recipes.ingredient_index import ingredient_index
 from recipes.models import Ingredient
 
 
 class Command(BaseImportCommand):
     help = 'Import ingredients from CSV file'
+    model = Ingredient
+    fields = ('name', 'measurement_unit')
+    conflict_fields = ('name', 'measurement_unit')
+    file_name = 'ingredients.csv'
+    success_message = 'Ингредиенты успешно импортированы'
 
-    def handle(self, *args, **kwargs):
-        created_count = self.import_data(
-            Ingredient, 'ingredients.csv', ['name', 'measurement_unit']
-        )
-        self.stdout.write(self.style.SUCCESS(
-            f'Ингредиенты успешно импортированы: {created_count}'
-        ))
+    def after_import(self):
+        ingredient_index.invalidate()
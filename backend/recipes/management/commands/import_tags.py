@@ -1,14 +1,18 @@
 from .import_base import BaseImportCommand
+from api.cache import bump_version
+from api.constants import RECIPES_VERSION, TAGS_VERSION
 from recipes.models import Tag
 
 
 class Command(BaseImportCommand):
     help = 'Import tags from CSV file'
+    model = Tag
+    fields = ('name', 'slug')
+    conflict_fields = ('slug',)
+    update_fields = ('name',)
+    file_name = 'tags.csv'
+    success_message = 'Теги успешно импортированы'
 
-    def handle(self, *args, **kwargs):
-        created_count = self.import_data(
-            Tag, 'tags.csv', ['name', 'slug']
-        )
-        self.stdout.write(
-            self.style.SUCCESS(f'Теги успешно импортированы: {created_count}')
-        )
+    def after_import(self):
+        bump_version(TAGS_VERSION)
+        bump_version(RECIPES_VERSION)
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.counters import recount_counters
+
+
+class Command(BaseCommand):
+    help = 'Repair drift in denormalized favorites, recipes and follow counts'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            repaired = recount_counters()
+        for counter, rows_count in repaired.items():
+            self.stdout.write(f'{counter}: исправлено строк: {rows_count}')
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны.'))
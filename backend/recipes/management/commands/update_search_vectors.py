@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+from recipes.search import update_search_vectors
+
+
+class Command(BaseCommand):
+    help = 'Rebuild full-text search vectors of all recipes'
+
+    def handle(self, *args, **kwargs):
+        update_search_vectors(Recipe.objects.all())
+        self.stdout.write(self.style.SUCCESS(
+            'Поисковые индексы рецептов обновлены.'
+        ))
@@ -0,0 +1,36 @@
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import connections
+from django.db.models import OuterRef, Subquery
+
+from .constants import SEARCH_CONFIG
+from .models import IngredientInRecipe, Recipe
+
+
+def update_search_vectors(recipes):
+    """
+    Пересчитывает поисковый вектор рецептов одним UPDATE:
+    название (вес A), названия ингредиентов (вес B) и описание (вес C).
+    На СУБД, отличных от PostgreSQL, ничего не делает.
+    """
+    if connections[recipes.db].vendor != 'postgresql':
+        return
+    ingredient_names = IngredientInRecipe.objects.filter(
+        recipe=OuterRef('pk')
+    ).order_by().values('recipe').annotate(
+        names=StringAgg('ingredient__name', delimiter=' ')
+    ).values('names')
+    recipes.update(
+        search_vector=(
+            SearchVector('name', weight='A', config=SEARCH_CONFIG)
+            + SearchVector(
+                Subquery(ingredient_names), weight='B', config=SEARCH_CONFIG
+            )
+            + SearchVector('text', weight='C', config=SEARCH_CONFIG)
+        )
+    )
+
+
+def update_search_vector(pk):
+    """Пересчитывает поисковый вектор одного рецепта."""
+    update_search_vectors(Recipe.objects.filter(pk=pk))
@@ -0,0 +1,155 @@
+import string
+import time
+from threading import Lock
+
+from django.core.cache import cache
+
+from .constants import (
+    SHORT_LINK_CHANGES_LIMIT,
+    SHORT_LINK_CHANGES_TIMEOUT,
+    SHORT_LINK_MULTIPLIER,
+    SHORT_LINK_TAIL_LENGTH,
+)
+from .models import Recipe
+
+INDEX_VERSION_KEY = 'short_link_index_version'
+INDEX_CHANGE_KEY = 'short_link_index_change_{}'
+LETTERS = string.ascii_letters
+ALPHABET = string.digits + string.ascii_letters
+CODE_COUNT = len(LETTERS) * len(ALPHABET) ** SHORT_LINK_TAIL_LENGTH
+INVERSE_MULTIPLIER = pow(SHORT_LINK_MULTIPLIER, -1, CODE_COUNT)
+
+
+def encode_short_code(pk):
+    number = pk * SHORT_LINK_MULTIPLIER % CODE_COUNT
+    tail = []
+    for _ in range(SHORT_LINK_TAIL_LENGTH):
+        number, digit = divmod(number, len(ALPHABET))
+        tail.append(ALPHABET[digit])
+    return LETTERS[number] + ''.join(reversed(tail))
+
+
+def decode_short_code(code):
+    number = LETTERS.index(code[0])
+    for char in code[1:]:
+        number = number * len(ALPHABET) + ALPHABET.index(char)
+    return number * INVERSE_MULTIPLIER % CODE_COUNT
+
+
+class ShortLinkConverter:
+    """
+    Код рецепта в коротких ссылках; прежние ссылки с числовым id
+    тоже принимаются — код всегда начинается с буквы.
+    """
+    regex = f'[A-Za-z][0-9A-Za-z]{{{SHORT_LINK_TAIL_LENGTH}}}|[0-9]+'
+
+    def to_python(self, value):
+        if value.isdigit():
+            return int(value)
+        return decode_short_code(value)
+
+    def to_url(self, value):
+        return encode_short_code(int(value))
+
+
+class ShortLinkIndex:
+    """
+    Битовая карта id существующих рецептов в памяти процесса: короткая
+    ссылка проверяется без обращения к базе, в том числе на промахе.
+    Создание и удаление рецепта увеличивают версию карты в общем кэше
+    и записывают изменённый бит под номером этой версии. Отставший
+    воркер применяет пропущенные изменения из кэша, а по базе карту
+    строит, только если журнал неполон: записи вытеснены, отставание
+    больше SHORT_LINK_CHANGES_LIMIT или версия сброшена invalidate()
+    после массовой загрузки.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._version = None
+        self._bitmap = bytearray()
+
+    @property
+    def version(self):
+        return cache.get_or_set(INDEX_VERSION_KEY, time.time_ns, None)
+
+    def invalidate(self):
+        self._next_version()
+
+    def __contains__(self, pk):
+        bitmap = self._load()
+        byte, bit = divmod(pk, 8)
+        return 0 <= byte < len(bitmap) and bool(bitmap[byte] >> bit & 1)
+
+    def add(self, pk):
+        self._record(pk, True)
+
+    def discard(self, pk):
+        self._record(pk, False)
+
+    def _next_version(self):
+        try:
+            return cache.incr(INDEX_VERSION_KEY)
+        except ValueError:
+            cache.add(INDEX_VERSION_KEY, time.time_ns(), None)
+            return cache.incr(INDEX_VERSION_KEY)
+
+    def _record(self, pk, value):
+        version = self._next_version()
+        cache.set(
+            INDEX_CHANGE_KEY.format(version), (pk, value),
+            SHORT_LINK_CHANGES_TIMEOUT
+        )
+        with self._lock:
+            if self._version == version - 1:
+                self._set_bit(pk, value)
+                self._version = version
+
+    def _set_bit(self, pk, value):
+        byte, bit = divmod(pk, 8)
+        if byte >= len(self._bitmap):
+            if not value:
+                return
+            self._bitmap.extend(bytes(byte - len(self._bitmap) + 1))
+        if value:
+            self._bitmap[byte] |= 1 << bit
+        else:
+            self._bitmap[byte] &= ~(1 << bit)
+
+    def _load(self):
+        if self._version != self.version:
+            with self._lock:
+                version = self.version
+                if self._version != version:
+                    if not self._apply_changes(version):
+                        self._build(version)
+        return self._bitmap
+
+    def _apply_changes(self, version):
+        """Пропущенные изменения из кэша; False, если журнал неполон."""
+        if self._version is None:
+            return False
+        if not 0 < version - self._version <= SHORT_LINK_CHANGES_LIMIT:
+            return False
+        keys = [
+            INDEX_CHANGE_KEY.format(number)
+            for number in range(self._version + 1, version + 1)
+        ]
+        changes = cache.get_many(keys)
+        if len(changes) < len(keys):
+            return False
+        for key in keys:
+            self._set_bit(*changes[key])
+        self._version = version
+        return True
+
+    def _build(self, version):
+        recipe_ids = list(Recipe.objects.values_list('pk', flat=True))
+        bitmap = bytearray(max(recipe_ids, default=-1) // 8 + 1)
+        for pk in recipe_ids:
+            bitmap[pk // 8] |= 1 << pk % 8
+        self._bitmap = bitmap
+        self._version = version
+
+
+short_link_index = ShortLinkIndex()
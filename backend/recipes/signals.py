@@ -0,0 +1,88 @@
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from users.models import Follow
+from .counters import change_counters
+from .ingredient_index import ingredient_index
+from .models import Favorite, Ingredient, Recipe
+from .search import update_search_vector, update_search_vectors
+from .short_links import short_link_index
+
+POSTGRES_SETUP_SQL = (
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS recipes_ingredient_name_trgm '
+    'ON recipes_ingredient USING gin (name gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS recipes_ingredient_upper_name_trgm '
+    'ON recipes_ingredient USING gin (UPPER(name) gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS recipes_recipe_search_vector '
+    'ON recipes_recipe USING gin (search_vector)',
+)
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_index(**kwargs):
+    ingredient_index.invalidate()
+
+
+@receiver(post_save, sender=Recipe)
+def add_to_short_link_index(instance, created, **kwargs):
+    """Бит рецепта ставится после фиксации, когда рецепт виден всем."""
+    if created:
+        pk = instance.pk
+        transaction.on_commit(lambda: short_link_index.add(pk))
+
+
+@receiver(post_delete, sender=Recipe)
+def discard_from_short_link_index(instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: short_link_index.discard(pk))
+
+
+@receiver(post_save, sender=Recipe)
+def update_search_vector_on_recipe_save(instance, **kwargs):
+    """
+    Вектор пересчитывается после фиксации, когда строки ингредиентов,
+    записанные в той же транзакции, уже на месте.
+    """
+    pk = instance.pk
+    transaction.on_commit(lambda: update_search_vector(pk))
+
+
+@receiver(post_save, sender=Ingredient)
+def update_search_vectors_on_ingredient_save(instance, created, **kwargs):
+    if not created:
+        update_search_vectors(
+            Recipe.objects.filter(ingredients_in_recipes__ingredient=instance)
+        )
+
+
+@receiver(post_migrate)
+def create_postgres_indexes(sender, using, **kwargs):
+    """
+    Создаёт индексы, которые нельзя описать переносимо в Meta:
+    GIN-индексы триграмм по названию ингредиента (по name для оператора %,
+    по UPPER(name) для istartswith/icontains, которые Django строит
+    через UPPER(...) LIKE) и GIN-индекс полнотекстового поиска рецептов.
+    """
+    connection = connections[using]
+    if sender.name != 'recipes' or connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        for statement in POSTGRES_SETUP_SQL:
+            cursor.execute(statement)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Follow)
+def increment_counters(instance, created, **kwargs):
+    if created:
+        change_counters(instance, 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Follow)
+def decrement_counters(instance, **kwargs):
+    change_counters(instance, -1)
@@ -0,0 +1,155 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from .models import (
+    Favorite,
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    ShoppingCart,
+    Tag,
+)
+from .short_links import ShortLinkIndex, short_link_index
+
+User = get_user_model()
+
+# Запросы страницы списка в админке: сессия, пользователь, варианты
+# фильтров, число строк (с учётом фильтров и без), строки и их связи.
+RECIPE_CHANGELIST_QUERIES = 9
+INGREDIENT_CHANGELIST_QUERIES = 6
+# Без фильтров: сессия, пользователь, два подсчёта строк и сами строки.
+TAG_CHANGELIST_QUERIES = 5
+FAVORITE_CHANGELIST_QUERIES = 5
+SHOPPING_CART_CHANGELIST_QUERIES = 5
+
+
+class AdminChangelistQueriesTest(TestCase):
+    """Число запросов списков в админке не зависит от числа строк."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            email='admin@example.com', username='admin',
+            first_name='Админ', last_name='Админов', password='password'
+        )
+        cls.tags = [
+            Tag.objects.create(name=f'Тег {number}', slug=f'tag-{number}')
+            for number in range(2)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def add_recipes(self, count):
+        """
+        Рецепты с тегами и ингредиентами, в избранном и списке покупок,
+        без сигналов bulk_create.
+        """
+        start = Recipe.objects.count()
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(start, start + count)
+        )
+        ingredients = list(Ingredient.objects.order_by('-pk')[:count])
+        Recipe.objects.bulk_create(
+            Recipe(
+                author=self.admin, name=f'Рецепт {number}',
+                text='Описание', cooking_time=10, image='recipes/test.png'
+            )
+            for number in range(start, start + count)
+        )
+        recipes = list(Recipe.objects.order_by('-pk')[:count])
+        Tag.objects.bulk_create(
+            Tag(name=f'Метка {number}', slug=f'label-{number}')
+            for number in range(start, start + count)
+        )
+        tags = list(Tag.objects.order_by('-pk')[:count])
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=tag)
+            for recipe, own_tag in zip(recipes, tags)
+            for tag in (*self.tags, own_tag)
+        )
+        Favorite.objects.bulk_create(
+            Favorite(user=self.admin, recipe=recipe) for recipe in recipes
+        )
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(user=self.admin, recipe=recipe) for recipe in recipes
+        )
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(recipe=recipe, ingredient=ingredient, amount=1)
+            for recipe in recipes for ingredient in ingredients[:3]
+        )
+
+    def assert_changelist_queries(self, model, queries):
+        url = reverse(f'admin:recipes_{model._meta.model_name}_changelist')
+        for count in (2, 10):
+            self.add_recipes(count)
+            with self.subTest(rows=count), self.assertNumQueries(queries):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+    def test_recipe_changelist_queries(self):
+        self.assert_changelist_queries(Recipe, RECIPE_CHANGELIST_QUERIES)
+
+    def test_ingredient_changelist_queries(self):
+        self.assert_changelist_queries(
+            Ingredient, INGREDIENT_CHANGELIST_QUERIES
+        )
+
+    def test_tag_changelist_queries(self):
+        self.assert_changelist_queries(Tag, TAG_CHANGELIST_QUERIES)
+
+    def test_favorite_changelist_queries(self):
+        self.assert_changelist_queries(
+            Favorite, FAVORITE_CHANGELIST_QUERIES
+        )
+
+    def test_shopping_cart_changelist_queries(self):
+        self.assert_changelist_queries(
+            ShoppingCart, SHOPPING_CART_CHANGELIST_QUERIES
+        )
+
+
+class ShortLinkIndexTest(TestCase):
+    """Короткие ссылки проверяются по битовой карте без запросов к базе."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Автор', last_name='Рецептов', password='password'
+        )
+        Recipe.objects.bulk_create([Recipe(
+            author=author, name='Рецепт', text='Описание',
+            cooking_time=10, image='recipes/test.png'
+        )])
+        cls.pk = Recipe.objects.get().pk
+
+    def setUp(self):
+        cache.clear()
+
+    def test_unknown_code_without_queries(self):
+        self.assertIn(self.pk, short_link_index)
+        url = reverse('redirect_short_link', args=[self.pk + 1])
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 404)
+
+    def test_changes_from_other_worker_without_queries(self):
+        other = ShortLinkIndex()
+        self.assertIn(self.pk, other)
+        short_link_index.discard(self.pk)
+        short_link_index.add(self.pk + 1)
+        with self.assertNumQueries(0):
+            self.assertNotIn(self.pk, other)
+            self.assertIn(self.pk + 1, other)
+
+    def test_invalidate_rebuilds(self):
+        other = ShortLinkIndex()
+        self.assertIn(self.pk, other)
+        short_link_index.discard(self.pk)
+        short_link_index.invalidate()
+        with self.assertNumQueries(1):
+            self.assertIn(self.pk, other)
@@ -0,0 +1,29 @@
+from django.db.models import Case, CharField, F, IntegerField, Value, When
+
+from .constants import UNIT_CONVERSIONS
+
+
+def base_unit_expression(unit_field):
+    """SQL-выражение базовой единицы для поля с единицей измерения."""
+    return Case(
+        *(
+            When(**{unit_field: unit}, then=Value(base_unit))
+            for unit, (base_unit, _) in UNIT_CONVERSIONS.items()
+            if unit != base_unit
+        ),
+        default=F(unit_field),
+        output_field=CharField(),
+    )
+
+
+def base_amount_expression(amount_field, unit_field):
+    """SQL-выражение количества, переведённого в базовую единицу."""
+    return F(amount_field) * Case(
+        *(
+            When(**{unit_field: unit}, then=Value(factor))
+            for unit, (_, factor) in UNIT_CONVERSIONS.items()
+            if factor != 1
+        ),
+        default=Value(1),
+        output_field=IntegerField(),
+    )
@@ -1,10 +1,13 @@
-from django.urls import path
+from django.urls import path, register_converter
 
+from .short_links import ShortLinkConverter
 from .views import redirect_short_link
 
+register_converter(ShortLinkConverter, 'short_link')
+
 urlpatterns = [
     path(
-        's/<int:pk>/',
+        's/<short_link:pk>/',
         redirect_short_link,
         name='redirect_short_link'
     ),
@@ -1,11 +1,11 @@
-from django.core.exceptions import ValidationError
+from django.http import Http404
 from django.shortcuts import redirect
 
-from .models import Recipe
+from .short_links import short_link_index
 
 
 def redirect_short_link(request, pk=None):
-    """Проверяем существование рецепта по id и выполняем редирект."""
-    if not Recipe.objects.filter(id=pk).exists():
-        raise ValidationError(f"Рецепт с id {pk} не найден.")
+    """Проверяем существование рецепта по индексу и выполняем редирект."""
+    if pk not in short_link_index:
+        raise Http404(f"Рецепт с id {pk} не найден.")
     return redirect(f'/recipes/{pk}/')
@@ -13,9 +13,9 @@ class UserAdmin(BaseUserAdmin):
         'full_name',
         'email',
         'show_avatar',
-        'get_recipes_count',
-        'get_subscriptions_count',
-        'get_followers_count',
+        'recipes_count',
+        'subscriptions_count',
+        'followers_count',
     )
     search_fields = ('username', 'email')
 
@@ -34,22 +34,10 @@ class UserAdmin(BaseUserAdmin):
             )
         return 'Нет аватара'
 
-    @admin.display(description='Рецепты')
-    def get_recipes_count(self, user):
-        """Возвращает количество рецептов пользователя."""
-        return user.recipes.count()
-
-    @admin.display(description='Подписки')
-    def get_subscriptions_count(self, user):
-        """Возвращает количество подписок."""
-        return user.authors.count()
-
-    @admin.display(description='Подписчики')
-    def get_followers_count(self, user):
-        """Возвращает количество подписчиков."""
-        return user.followers.count()
-
 
 @admin.register(Follow)
 class FollowAdmin(admin.ModelAdmin):
     list_display = ('user', 'author')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user', 'author')
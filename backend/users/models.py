@@ -5,7 +5,31 @@ from django.db import models
 from django.db.models import UniqueConstraint
 
 
-class User(AbstractUser):
+class CounterFieldsMixin:
+    """
+    Счётчики меняются в базе атомарными UPDATE, поэтому при сохранении
+    существующей строки целиком они не записываются: значения в памяти
+    могли устареть и затёрли бы изменения из других запросов.
+    """
+    counter_fields = ()
+
+    def save(self, force_insert=False, force_update=False, using=None,
+             update_fields=None):
+        if update_fields is None and not self._state.adding:
+            deferred = self.get_deferred_fields()
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+                and field.attname not in deferred
+            ]
+        super().save(
+            force_insert=force_insert, force_update=force_update,
+            using=using, update_fields=update_fields
+        )
+
+
+class User(CounterFieldsMixin, AbstractUser):
     username = models.CharField(
         verbose_name='Логин',
         unique=True,
@@ -31,6 +55,18 @@ class User(AbstractUser):
         blank=True,
         null=True
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Рецепты'
+    )
+    subscriptions_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Подписки'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Подписчики'
+    )
+    counter_fields = (
+        'recipes_count', 'subscriptions_count', 'followers_count'
+    )
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
 
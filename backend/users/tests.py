@@ -0,0 +1,54 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from .models import Follow, User
+
+# Запросы страницы списка пользователей в админке: сессия, пользователь,
+# варианты фильтров групп, число строк (с учётом фильтров и без) и строки.
+USER_CHANGELIST_QUERIES = 6
+# Подписки: сессия, пользователь, два подсчёта строк и строки с авторами.
+FOLLOW_CHANGELIST_QUERIES = 5
+
+
+class AdminChangelistQueriesTest(TestCase):
+    """Число запросов списка пользователей не зависит от числа строк."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            email='admin@example.com', username='admin',
+            first_name='Админ', last_name='Админов', password='password'
+        )
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def add_users(self, count):
+        start = User.objects.count()
+        User.objects.bulk_create(
+            User(
+                email=f'user{number}@example.com', username=f'user{number}',
+                first_name='Имя', last_name='Фамилия'
+            )
+            for number in range(start, start + count)
+        )
+        Follow.objects.bulk_create(
+            Follow(user=user, author=self.admin)
+            for user in User.objects.exclude(pk=self.admin.pk).filter(
+                followers__isnull=True
+            )
+        )
+
+    def assert_changelist_queries(self, model, queries):
+        url = reverse(f'admin:users_{model._meta.model_name}_changelist')
+        for count in (2, 10):
+            self.add_users(count)
+            with self.subTest(rows=count), self.assertNumQueries(queries):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+    def test_user_changelist_queries(self):
+        self.assert_changelist_queries(User, USER_CHANGELIST_QUERIES)
+
+    def test_follow_changelist_queries(self):
+        self.assert_changelist_queries(Follow, FOLLOW_CHANGELIST_QUERIES)